@@ -8,165 +8,368 @@ import os
 from datetime import datetime
 
 # Import effects
-from effects.spotlight import apply_spotlight_effect
-from effects.vignette import apply_vignette_effect
-from effects.light_rays import apply_light_rays_effect
-from effects.color_temperature import apply_color_temperature
-from effects.dramatic_shadows import apply_dramatic_shadows
-from effects.glowing_highlights import apply_glowing_highlights
-from effects.light_leaks import apply_light_leaks
-from effects.lens_flare import apply_lens_flare
+from effects.suggestions import suggest_parameters
+from effects.registry import is_seeded
+from effects.roi import ellipse_mask, load_mask, rectangle_mask
+from cost_model import admit_render, describe_plan
+from render_scheduler import RenderScheduler
+from contact_sheet import render_contact_sheet
+from export_bundle import export_bundle
+from edit_history import EditHistory, cached_render, history_thumbnail, is_cached
+from concurrent.futures import CancelledError, wait
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
-# Streamlit UI setup
-st.set_page_config(page_title="Lighting Effects Editor", layout="wide")
-st.title("💡 Professional Lighting Effects Editor")
+@st.cache_resource(show_spinner=False, max_entries=8)
+def load_upload(file_id, _uploaded_file):
+    """Decode an upload once; the array is shared, so it is read-only."""
+    image = np.array(Image.open(_uploaded_file))  # Convert to OpenCV format
+    image.setflags(write=False)
+    return image
 
-# Sidebar
-st.sidebar.header("🔧 Adjust Effect Parameters")
-st.sidebar.write("Upload an image and choose an effect to apply.")
+@st.cache_data(show_spinner=False)
+def get_suggestions(file_id, _image):
+    """Thumbnail-based starting parameters, computed once per upload."""
+    return suggest_parameters(_image)
 
-# Image upload
-uploaded_file = st.sidebar.file_uploader("📂 Upload an image", type=["jpg", "jpeg", "png", "webp"])
-if uploaded_file:
-    image = Image.open(uploaded_file)
-    image = np.array(image)  # Convert to OpenCV format
+@st.cache_resource(show_spinner=False)
+def get_scheduler():
+    """Render scheduler shared by every session of this server process."""
+    return RenderScheduler()
 
-    # List all available effects in a single dropdown
-    all_effects = ["Spotlight", "Vignette", "Light Rays", "Light Leaks", "Flare", 
-                  "Color Temperature", "Dramatic Shadows", "Glowing Highlights"]
-    
-    # Create a selectbox for effects
-    effect_option = st.sidebar.selectbox("🎛 Choose Effect:", all_effects)
+@st.cache_data(show_spinner=False, max_entries=4)
+def get_contact_sheet(file_id, _image, names, base_params, seed):
+    """Thumbnail grid of effects at several settings, rendered once per upload and settings."""
+    # Queued like any other render, using one worker's share of the cores
+    scheduler = get_scheduler()
+    return scheduler.run(get_session_id(), render_contact_sheet, _image, names=names,
+                         base_params=base_params, seed=seed,
+                         workers=scheduler.threads_per_worker, supersede=False)
 
-    # Initialize session state variables **only if not set**
-    if "brightness" not in st.session_state:
-        st.session_state["brightness"] = 1.5
-    # Always ensure radius is at least 600
-    st.session_state["radius"] = max(600, st.session_state.get("radius", 600))
-    if "shadow_intensity" not in st.session_state:
-        st.session_state["shadow_intensity"] = 1.5
-    if "ambient_light" not in st.session_state:
-        st.session_state["ambient_light"] = 0.2
-    if "images_saved" not in st.session_state:
-        st.session_state["images_saved"] = False
-        st.session_state["save_message"] = ""
+# Session state keys holding each effect's parameters in the editor; the
+# sliders take their values from these, so settings can be loaded into them.
+# Positions are held by one key per coordinate, one for each slider.
+PARAM_STATE_KEYS = {
+    "Spotlight": {"brightness": "brightness", "radius": "radius",
+                  "center": ("spotlight_x", "spotlight_y"), "ambient_light": "ambient_light"},
+    "Vignette": {"intensity": "vignette_intensity"},
+    "Light Rays": {"intensity": "rays_intensity", "angle": "rays_angle", "num_rays": "num_rays",
+                   "ray_width": "ray_width", "ray_length": "ray_length"},
+    "Light Leaks": {"intensity": "leak_intensity"},
+    "Flare": {"intensity": "flare_intensity", "flare_size": "flare_size", "position": ("flare_x", "flare_y")},
+    "Color Temperature": {"warmth": "warmth"},
+    "Dramatic Shadows": {"shadow_intensity": "shadow_intensity"},
+    "Glowing Highlights": {"glow_intensity": "glow_intensity"},
+}
 
-    # Sidebar effect parameters (No direct session state modification)
-    if effect_option == "Spotlight":
-        max_radius = min(image.shape[0], image.shape[1]) // 2
-        
-        # Set a fixed default radius of 600 pixels
-        default_radius = 600
-        
-        # Ensure the session state radius is at least 600
-        if st.session_state["radius"] < 600:
-            st.session_state["radius"] = 600
+SELECTION_TYPES = ["Whole Image", "Rectangle", "Ellipse", "Uploaded Mask"]
 
-        brightness = st.sidebar.slider("🔆 Brightness", 0.5, 3.0, st.session_state["brightness"])
-        radius = st.sidebar.slider("⭕ Spotlight Radius", 600, max_radius, st.session_state["radius"])
+# Session state keys of the selection controls, and of the rectangle's and
+# ellipse's sliders in the order of their "shape" in a stored selection
+SELECTION_STATE_KEYS = {"type": "selection_type", "feather": "feather",
+                        "Rectangle": ("sel_x", "sel_y", "sel_w", "sel_h"),
+                        "Ellipse": ("sel_cx", "sel_cy", "sel_ax", "sel_ay")}
 
-        center_x = st.sidebar.slider("🎯 Spotlight X", 0, image.shape[1], image.shape[1] // 2)
-        center_y = st.sidebar.slider("🎯 Spotlight Y", 0, image.shape[0], image.shape[0] // 2)
+# Keys of the widgets that take their value from session state (key=...). A
+# widget's default is part of its identity, so widgets fed value= from session
+# state would keep showing a dragged value when a callback loads another one.
+WIDGET_STATE_KEYS = [key for state_keys in list(PARAM_STATE_KEYS.values()) + [SELECTION_STATE_KEYS]
+                     for state_key in state_keys.values()
+                     for key in (state_key if isinstance(state_key, tuple) else (state_key,))]
 
-        # Add ambient light control
-        ambient_light = st.sidebar.slider("🌑 Ambient Light", 0.0, 0.5, st.session_state["ambient_light"], 0.05)
-        
-        # Show a loading indicator while processing
-        with st.spinner("Applying spotlight effect..."):
+def keep_widget_state(keys):
+    """
+    Keep keyed widgets' values while they aren't shown.
+
+    Streamlit drops a widget's session state after a run that doesn't render
+    it (e.g. another effect's sliders); assigning the values again at the top
+    of each run keeps them.
+    """
+    for key in keys:
+        if key in st.session_state:
+            st.session_state[key] = st.session_state[key]
+
+def load_params(effect, params):
+    """Button callback: open an effect in the editor with the given parameters."""
+    st.session_state["effect_option"] = effect
+    for param, value in params.items():
+        if param == "seed":
+            st.session_state["seed"] = value
+            continue
+        if param == "warmth":
+            value = int(round(value * 100))  # The slider is in percent
+        state_key = PARAM_STATE_KEYS[effect][param]
+        if isinstance(state_key, tuple):
+            for coordinate_key, coordinate in zip(state_key, value):
+                st.session_state[coordinate_key] = int(coordinate)
+        else:
+            st.session_state[state_key] = value
+
+def editor_params(effect):
+    """The editor's current parameters for an effect, as load_params takes them."""
+    params = {}
+    for param, state_key in PARAM_STATE_KEYS[effect].items():
+        if isinstance(state_key, tuple):
+            if all(key in st.session_state for key in state_key):
+                params[param] = tuple(st.session_state[key] for key in state_key)
+        elif state_key in st.session_state:
+            params[param] = st.session_state[state_key]
+    if "warmth" in params:
+        params["warmth"] = params["warmth"] / 100
+    return params
+
+def selection_mask(selection, image_shape, masks, shape=None):
+    """
+    Mask of a selection at shape (default image_shape), or None for the whole image.
+
+    selection is as stored in the edit history: its "type", its "shape" in
+    image coordinates (rectangle x, y, width, height or ellipse center and
+    radii) or the "mask_id" of an uploaded mask in masks, and its "feather".
+    """
+    if selection is None:
+        return None
+    shape = shape or image_shape
+    scale = shape[1] / image_shape[1]
+    if selection["type"] == "Rectangle":
+        x, y, width, height = (value * scale for value in selection["shape"])
+        return rectangle_mask(shape, x, y, max(1, width), max(1, height))
+    if selection["type"] == "Ellipse":
+        center_x, center_y, radius_x, radius_y = (value * scale for value in selection["shape"])
+        return ellipse_mask(shape, (center_x, center_y), (max(1, radius_x), max(1, radius_y)))
+    mask = masks.get(selection["mask_id"])
+    return None if mask is None else load_mask(mask, shape)
+
+def load_selection(selection):
+    """Set the selection controls to a selection stored in the edit history."""
+    if selection is None:
+        st.session_state[SELECTION_STATE_KEYS["type"]] = "Whole Image"
+        return
+    st.session_state[SELECTION_STATE_KEYS["type"]] = selection["type"]
+    st.session_state[SELECTION_STATE_KEYS["feather"]] = selection["feather"]
+    if selection["type"] == "Uploaded Mask":
+        st.session_state["sel_mask_id"] = selection["mask_id"]
+    else:
+        for key, value in zip(SELECTION_STATE_KEYS[selection["type"]], selection["shape"]):
+            st.session_state[key] = value
+
+def step_history(step):
+    """Button callback: undo (step -1) or redo (step 1) and load that edit."""
+    history = st.session_state["history"]
+    entry = history.undo() if step < 0 else history.redo()
+    if entry is not None:
+        load_params(entry["effect"], entry["params"])
+        load_selection(entry["selection"])
+
+def go_to_history(index):
+    """Button callback: load an earlier or later edit from the history."""
+    entry = st.session_state["history"].go_to(index)
+    load_params(entry["effect"], entry["params"])
+    load_selection(entry["selection"])
+
+def get_session_id():
+    """Id of the current browser session, used for fair render queuing."""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "default"
+
+def rerun_pending():
+    """
+    Whether Streamlit already has a newer rerun queued for this session.
+
+    Returns None if this Streamlit version doesn't expose it.
+    """
+    ctx = get_script_run_ctx()
+    # Reruns from widgets inside a fragment don't interrupt the running
+    # script, so the queued request is checked directly. ScriptRequests keeps
+    # it in a private field; without it renders simply run to completion.
+    state = getattr(getattr(ctx, "script_requests", None), "_state", None)
+    if state is None:
+        return None
+    return state.name == "RERUN"
+
+def controls_settled(seconds):
+    """
+    Wait up to seconds for further parameter changes.
+
+    Returns False as soon as a newer rerun is queued (the controls are still
+    moving), True otherwise. Without rerun detection it returns at once.
+    """
+    if rerun_pending() is None:
+        return True
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        if rerun_pending():
+            return False
+        time.sleep(RENDER_POLL_SECONDS)
+    return not rerun_pending()
+
+# How often a script waiting for its render checks for a newer rerun
+RENDER_POLL_SECONDS = 0.05
+
+def wait_for_render(scheduler, future):
+    """
+    Wait for a scheduled render, cancelling it as soon as the session reruns.
+
+    Raises CancelledError if a newer rerun arrived or the job was superseded.
+    """
+    try:
+        while not wait([future], RENDER_POLL_SECONDS).done:
+            if rerun_pending():
+                raise CancelledError()
+        return future.result()
+    finally:
+        if not future.done():
+            scheduler.cancel(future)
+
+# Partial reruns: widgets inside a fragment rerun only that function, so a
+# parameter change doesn't re-decode the upload, rebuild the sidebar or resend
+# the original image. Older Streamlit versions fall back to full reruns.
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda fn: fn)
+
+# After a parameter change, how long to watch for further changes before
+# rendering, so a burst of slider changes starts one render, not one per position
+DEBOUNCE_SECONDS = 0.2
+
+@fragment
+def effect_panel(image, file_id, effect_option, suggestions, selection, region_mask):
+    """Parameter controls, processed image and download for the chosen effect."""
+    feather = selection["feather"] if selection is not None else 0
+    selection_key = repr(selection)
+    st.subheader(f"With {effect_option} Effect")
+
+    with st.expander("🔧 Parameters", expanded=True):
+        # Effect parameters (No direct session state modification)
+        if effect_option == "Spotlight":
+            max_radius = min(image.shape[0], image.shape[1]) // 2
+            
+            # Set a fixed default radius of 600 pixels
+            default_radius = 600
+            
+            # Ensure the session state radius is at least 600
+            if st.session_state["radius"] < 600:
+                st.session_state["radius"] = 600
+
+            brightness = st.slider("🔆 Brightness", 0.5, 3.0, key="brightness")
+            radius = st.slider("⭕ Spotlight Radius", 600, max_radius, key="radius")
+
+            center_x = st.slider("🎯 Spotlight X", 0, image.shape[1], key="spotlight_x")
+            center_y = st.slider("🎯 Spotlight Y", 0, image.shape[0], key="spotlight_y")
+
+            # Add ambient light control
+            ambient_light = st.slider("🌑 Ambient Light", 0.0, 0.5, step=0.05, key="ambient_light")
+            
             # Pass the ambient light parameter to the spotlight effect
-            output = apply_spotlight_effect(image, (center_x, center_y), radius, brightness, ambient_light)
-
-        # Update session state to keep user adjustments
-        st.session_state["brightness"] = brightness
-        st.session_state["radius"] = radius
-        st.session_state["ambient_light"] = ambient_light
-    elif effect_option == "Vignette":
-        intensity = st.sidebar.slider("🌗 Intensity", 0.5, 3.0, 1.5)
-        output = apply_vignette_effect(image, intensity)
-
-    elif effect_option == "Light Rays":
-        intensity = st.sidebar.slider("☀️ Light Rays Intensity", 0.1, 2.0, 1.0)
-        angle = st.sidebar.slider("🌅 Light Rays Angle", 0, 360, 45)
-        num_rays = st.sidebar.slider("🔢 Number of Rays", 5, 50, 20)
-        ray_width = st.sidebar.slider("📏 Ray Width", 1, 10, 2)
-        ray_length = st.sidebar.slider("📏 Ray Length", 0.1, 1.0, 0.8)
-        output = apply_light_rays_effect(image, intensity, angle, num_rays, ray_width, ray_length)
-
-    elif effect_option == "Color Temperature":
-        warmth = st.sidebar.slider("🌡 Warmth (-100 to 100)", -100, 100, 0)
-        output = apply_color_temperature(image, warmth/100)
-
-    elif effect_option == "Dramatic Shadows":
-        intensity = st.sidebar.slider("🌑 Shadow Intensity", 0.5, 3.0, st.session_state["shadow_intensity"])
-        output = apply_dramatic_shadows(image, intensity)
-        st.session_state["shadow_intensity"] = intensity
-
-    elif effect_option == "Glowing Highlights":
-        intensity = st.sidebar.slider("✨ Highlight Intensity", 0.5, 3.0, 1.5)
-        output = apply_glowing_highlights(image, intensity)
-        
-    elif effect_option == "Light Leaks":
-        intensity = st.sidebar.slider("🌈 Light Leak Intensity", 0.1, 1.0, 0.5)
-        output = apply_light_leaks(image, intensity)
-        
-    elif effect_option == "Flare":
-        intensity = st.sidebar.slider("💫 Flare Intensity", 0.1, 1.0, 0.5)
-        flare_size = st.sidebar.slider("📐 Flare Size", 0.5, 2.0, 1.0)
-        
-        # Initialize flare position in session state if not already set
-        if "flare_position" not in st.session_state:
-            st.session_state["flare_position"] = (image.shape[1] // 2, image.shape[0] // 2)  # Default center
-        
-        # Display instructions
-        st.write("👆 Click on the image to position the flare")
-        
-        # Display the image for clicking
-        col1, col2 = st.columns([3, 1])
-        with col1:
-            # Convert image to PIL for display
-            preview_img = Image.fromarray(image)
+            params = {"center": (center_x, center_y), "radius": radius,
+                      "brightness": brightness, "ambient_light": ambient_light}
+        elif effect_option == "Vignette":
+            intensity = st.slider("🌗 Intensity", 0.5, 3.0, key="vignette_intensity")
+            params = {"intensity": intensity}
+
+        elif effect_option == "Light Rays":
+            intensity = st.slider("☀️ Light Rays Intensity", 0.1, 2.0, key="rays_intensity")
+            angle = st.slider("🌅 Light Rays Angle", 0, 360, key="rays_angle")
+            num_rays = st.slider("🔢 Number of Rays", 5, 50, key="num_rays")
+            ray_width = st.slider("📏 Ray Width", 1, 10, key="ray_width")
+            ray_length = st.slider("📏 Ray Length", 0.1, 1.0, key="ray_length")
+            params = {"intensity": intensity, "angle": angle, "num_rays": num_rays,
+                      "ray_width": ray_width, "ray_length": ray_length}
+
+        elif effect_option == "Color Temperature":
+            suggested_warmth = int(round(suggestions["warmth"] * 100))
+            warmth = st.slider("🌡 Warmth (-100 to 100)", -100, 100, key="warmth")
+            st.caption(f"Suggested warmth to neutralize color cast: {suggested_warmth}")
+            params = {"warmth": warmth/100}
+
+        elif effect_option == "Dramatic Shadows":
+            intensity = st.slider("🌑 Shadow Intensity", 0.5, 3.0, key="shadow_intensity")
+            params = {"shadow_intensity": intensity}
+
+        elif effect_option == "Glowing Highlights":
+            intensity = st.slider("✨ Highlight Intensity", 0.5, 3.0, key="glow_intensity")
+            params = {"glow_intensity": intensity}
             
-            # Create a placeholder for the image
-            img_placeholder = st.empty()
-            img_placeholder.image(preview_img, width=None)
+        elif effect_option == "Light Leaks":
+            intensity = st.slider("🌈 Light Leak Intensity", 0.1, 1.0, key="leak_intensity")
+            params = {"intensity": intensity}
             
-            # Get the dimensions of the displayed image container
-            # This is a workaround since Streamlit doesn't provide exact dimensions
-            container_width = st.container().width
+        elif effect_option == "Flare":
+            intensity = st.slider("💫 Flare Intensity", 0.1, 1.0, key="flare_intensity")
+            flare_size = st.slider("📐 Flare Size", 0.5, 2.0, key="flare_size")
             
-            # Handle click event
-            if st.button("Reset Flare Position"):
-                st.session_state["flare_position"] = (image.shape[1] // 2, image.shape[0] // 2)
-                st.rerun()
-        
-        # Create columns for manual position adjustment
-        col_x, col_y = st.columns(2)
-        with col_x:
-            # Add a slider for X position
-            new_x = st.slider("Flare X Position", 0, image.shape[1], st.session_state["flare_position"][0])
-            if new_x != st.session_state["flare_position"][0]:
-                st.session_state["flare_position"] = (new_x, st.session_state["flare_position"][1])
-        
-        with col_y:
-            # Add a slider for Y position
-            new_y = st.slider("Flare Y Position", 0, image.shape[0], st.session_state["flare_position"][1])
-            if new_y != st.session_state["flare_position"][1]:
-                st.session_state["flare_position"] = (st.session_state["flare_position"][0], new_y)
-        
-        # Apply the lens flare effect with the current position
-        output = apply_lens_flare(image, st.session_state["flare_position"], intensity, flare_size)
-        
-        # Show the current flare position
-        st.write(f"Current flare position: X={st.session_state['flare_position'][0]}, Y={st.session_state['flare_position'][1]}")
+            # Display instructions
+            st.write("👆 Use the sliders to position the flare on the original image")
+            
+            # Reset to the suggested position (the brightest region)
+            st.button("Reset Flare Position", on_click=load_params,
+                      args=("Flare", {"position": suggestions["flare_position"]}))
+            
+            # Create columns for manual position adjustment
+            col_x, col_y = st.columns(2)
+            with col_x:
+                # Add a slider for X position
+                flare_x = st.slider("Flare X Position", 0, image.shape[1], key="flare_x")
+            
+            with col_y:
+                # Add a slider for Y position
+                flare_y = st.slider("Flare Y Position", 0, image.shape[0], key="flare_y")
+            
+            # Apply the lens flare effect with the current position
+            params = {"position": (flare_x, flare_y), "intensity": intensity, "flare_size": flare_size}
+            
+            # Show the current flare position
+            st.write(f"Current flare position: X={flare_x}, Y={flare_y}")
 
-    # Display the original and processed images side by side
-    col1, col2 = st.columns(2)
-    with col1:
-        st.subheader("Original Image")
-        st.image(image, width=None)
-    with col2:
-        st.subheader(f"With {effect_option} Effect")
-        st.image(output, width=None)
+        # Randomized effects keep their layout across slider moves (so their
+        # cached intermediates stay valid) until the user reshuffles it
+        if is_seeded(effect_option):
+            if st.button("🎲 Shuffle Layout"):
+                st.session_state["seed"] = int(np.random.randint(0, 2**31 - 1))
+            params["seed"] = st.session_state["seed"]
+
+    # Debounce: after a parameter change, wait briefly for the controls to
+    # settle. If another change is queued meanwhile this run ends without
+    # rendering, so intermediate slider positions never start a render.
+    output_slot = st.empty()
+    render_key = (file_id, effect_option, repr(params), selection_key)
+    from_cache = is_cached(render_key)
+    if st.session_state.get("last_render_key") not in (None, render_key) and not from_cache:
+        if not controls_settled(DEBOUNCE_SECONDS):
+            st.stop()
+    st.session_state["last_render_key"] = render_key
+
+    # Render through the shared scheduler (bounded workers, fair across
+    # sessions, a newer rerun cancels this session's render, queued or
+    # running) and
+    # within the memory budget: oversized renders are downgraded to a proxy
+    # or tiled path, and renders wait while other sessions hold the memory.
+    # Recent outputs are cached, so stepping back through the history is instant.
+    scheduler = get_scheduler()
+    session_id = get_session_id()
+    with st.spinner(f"Applying {effect_option.lower()} effect..."):
+        try:
+            # Parameter-independent intermediates are cached per upload, so
+            # intensity-only slider moves cost a single blend
+            output, render_plan = cached_render(render_key, lambda: wait_for_render(scheduler, scheduler.submit(
+                session_id, admit_render, effect_option, image, params,
+                image_key=file_id, mask=region_mask, feather=feather)))
+        except CancelledError:
+            # Superseded by this session's next rerun, which renders instead
+            st.stop()
+        except TimeoutError:
+            st.error("⏳ The server is busy with other renders. Please try again in a moment.")
+            st.stop()
+    render_stats = scheduler.stats(session_id)
+    if from_cache:
+        st.caption("⏱ Shown from the render cache")
+    else:
+        st.caption(f"⏱ Queue wait {render_stats['last_queue_wait']:.2f} s · "
+                   f"Render {render_stats['last_service_time']:.2f} s "
+                   f"(avg {render_stats['mean_queue_wait']:.2f} s / {render_stats['mean_service_time']:.2f} s)")
+    render_note = describe_plan(render_plan)
+    if render_note:
+        st.warning(render_note)
+    st.session_state["history"].record(effect_option, params, selection)
+
+    # Display the processed image
+    output_slot.image(output, width=None)
         
     # Add download button for the processed image
     # Create a unique filename based on effect and timestamp
@@ -245,7 +448,7 @@ if uploaded_file:
             param_text = f"Leak Intensity: {intensity:.1f}"
         elif effect_option == "Flare":
             param_text = f"Intensity: {intensity:.1f}   Size: {flare_size:.1f}"
-            param_text2 = f"Position: X={st.session_state['flare_position'][0]}, Y={st.session_state['flare_position'][1]}"
+            param_text2 = f"Position: X={flare_x}, Y={flare_y}"
         
         # Increase font size for parameters text
         param_font_size = 1.2
@@ -273,16 +476,47 @@ if uploaded_file:
         st.session_state["images_saved"] = True
         st.session_state["save_message"] = f"✅ Comparison image saved to results directory as comparison_{filename_base}.jpg"
     
-    # Add download button with callback
-    buf = io.BytesIO()
-    Image.fromarray(output).save(buf, format="PNG")
+    # Add download button with callback; the PNG is only re-encoded when the
+    # output changes, not on every rerun of this panel
+    if st.session_state.get("download_key") != render_key:
+        buf = io.BytesIO()
+        Image.fromarray(output).save(buf, format="PNG")
+        st.session_state["download_key"] = render_key
+        st.session_state["download_png"] = buf.getvalue()
     btn = st.download_button(
         label="💾 Download Processed Image",
-        data=buf.getvalue(),
+        data=st.session_state["download_png"],
         file_name=f"processed_{filename_base}.png",
         mime="image/png",
         on_click=save_images
     )
+
+    # Export bundle: full, web and thumbnail sizes in JPEG, WebP and PNG,
+    # encoded in parallel from this render and saved as one zip. It is queued
+    # like a render, so concurrent exports from many sessions stay bounded.
+    if st.button("📦 Build Export Bundle"):
+        bundle_path = os.path.join("results", f"bundle_{filename_base}.zip")
+        with st.spinner("Encoding renditions..."):
+            try:
+                manifest = scheduler.run(session_id, export_bundle, output, bundle_path,
+                                         workers=scheduler.threads_per_worker, supersede=False)
+            except CancelledError:
+                st.stop()
+        with open(bundle_path, "rb") as f:
+            st.session_state["bundle_zip"] = f.read()
+        st.session_state["bundle_key"] = render_key
+        st.session_state["bundle_name"] = os.path.basename(bundle_path)
+        st.session_state["bundle_manifest"] = manifest
+    if st.session_state.get("bundle_key") == render_key:
+        manifest = st.session_state["bundle_manifest"]
+        st.caption(f"📦 {len(manifest['files'])} files, {manifest['bytes'] / 1024:.0f} KB, "
+                   f"encoded in {manifest['total_seconds']:.2f} s")
+        st.download_button(
+            label="📦 Download Export Bundle",
+            data=st.session_state["bundle_zip"],
+            file_name=st.session_state["bundle_name"],
+            mime="application/zip"
+        )
     
     # Display success message if images were saved
     if st.session_state["images_saved"]:
@@ -312,7 +546,178 @@ if uploaded_file:
         
         # Reset the flag after displaying the message
         st.session_state["images_saved"] = False
+
+# Streamlit UI setup
+st.set_page_config(page_title="Lighting Effects Editor", layout="wide")
+st.title("💡 Professional Lighting Effects Editor")
+
+# Sidebar
+st.sidebar.header("🔧 Adjust Effect Parameters")
+st.sidebar.write("Upload an image and choose an effect to apply.")
+
+# Image upload
+uploaded_file = st.sidebar.file_uploader("📂 Upload an image", type=["jpg", "jpeg", "png", "webp"])
+if uploaded_file:
+    image = load_upload(uploaded_file.file_id, uploaded_file)
+
+    # Suggested starting parameters for each effect (cheap, thumbnail based)
+    suggestions = get_suggestions(uploaded_file.file_id, image)
+
+    # List all available effects in a single dropdown
+    all_effects = ["Spotlight", "Vignette", "Light Rays", "Light Leaks", "Flare", 
+                  "Color Temperature", "Dramatic Shadows", "Glowing Highlights"]
     
+    # Create a selectbox for effects
+    effect_option = st.sidebar.selectbox("🎛 Choose Effect:", all_effects, key="effect_option")
+
+    # Initialize session state variables **only if not set**
+    if "brightness" not in st.session_state:
+        st.session_state["brightness"] = 1.5
+    # Always ensure radius is at least 600
+    st.session_state["radius"] = max(600, st.session_state.get("radius", 600))
+    if "shadow_intensity" not in st.session_state:
+        st.session_state["shadow_intensity"] = 1.5
+    if "ambient_light" not in st.session_state:
+        st.session_state["ambient_light"] = 0.2
+    for state_key, default in [("vignette_intensity", 1.5), ("rays_intensity", 1.0), ("leak_intensity", 0.5),
+                               ("flare_intensity", 0.5), ("glow_intensity", 1.5)]:
+        if state_key not in st.session_state:
+            st.session_state[state_key] = default
+    for state_key, default in [("num_rays", 20), ("ray_width", 2), ("ray_length", 0.8), ("flare_size", 1.0)]:
+        if state_key not in st.session_state:
+            st.session_state[state_key] = default
+    # Each new upload starts from its suggested values, with a fresh edit history
+    if st.session_state.get("upload_id") != uploaded_file.file_id:
+        st.session_state["upload_id"] = uploaded_file.file_id
+        st.session_state["warmth"] = int(round(suggestions["warmth"] * 100))
+        st.session_state["spotlight_x"], st.session_state["spotlight_y"] = suggestions["spotlight_center"]
+        st.session_state["rays_angle"] = suggestions["light_rays_angle"]
+        st.session_state["flare_x"], st.session_state["flare_y"] = suggestions["flare_position"]
+        img_h, img_w = image.shape[:2]
+        for key, value in zip(SELECTION_STATE_KEYS["Rectangle"], (img_w // 4, img_h // 4, img_w // 2, img_h // 2)):
+            st.session_state[key] = value
+        for key, value in zip(SELECTION_STATE_KEYS["Ellipse"], (img_w // 2, img_h // 2, img_w // 4, img_h // 4)):
+            st.session_state[key] = value
+        # Uploaded masks by file id, resized to this image, so history entries can reuse them
+        st.session_state["masks"] = {}
+        st.session_state["sel_mask_id"] = None
+        st.session_state["history"] = EditHistory(uploaded_file.file_id)
+    if "selection_type" not in st.session_state:
+        st.session_state["selection_type"] = "Whole Image"
+        st.session_state["feather"] = 10
+    if "seed" not in st.session_state:
+        st.session_state["seed"] = int(np.random.randint(0, 2**31 - 1))
+    if "images_saved" not in st.session_state:
+        st.session_state["images_saved"] = False
+        st.session_state["save_message"] = ""
+    keep_widget_state(WIDGET_STATE_KEYS)
+
+    # Undo/redo through this upload's edits; only their settings are stored
+    undo_col, redo_col = st.sidebar.columns(2)
+    undo_col.button("↩️ Undo", on_click=step_history, args=(-1,), use_container_width=True)
+    redo_col.button("↪️ Redo", on_click=step_history, args=(1,), use_container_width=True)
+
+    # Optionally restrict the effect to a selection; only the selected area
+    # (plus the effect's margin) is processed
+    # The controls keep their values in session state, so undo/redo can
+    # restore the selection an edit was made with
+    masks = st.session_state["masks"]
+    selection = None
+    with st.sidebar.expander("🎯 Apply to Selection"):
+        selection_type = st.radio("Selection", SELECTION_TYPES, key="selection_type")
+        img_h, img_w = image.shape[:2]
+        if selection_type == "Rectangle":
+            sel_x = st.slider("Left", 0, img_w - 1, key="sel_x")
+            sel_y = st.slider("Top", 0, img_h - 1, key="sel_y")
+            sel_w = st.slider("Width", 1, img_w, key="sel_w")
+            sel_h = st.slider("Height", 1, img_h, key="sel_h")
+            selection = {"type": selection_type, "shape": (sel_x, sel_y, sel_w, sel_h)}
+        elif selection_type == "Ellipse":
+            sel_cx = st.slider("Center X", 0, img_w, key="sel_cx")
+            sel_cy = st.slider("Center Y", 0, img_h, key="sel_cy")
+            sel_ax = st.slider("Horizontal Radius", 1, img_w, key="sel_ax")
+            sel_ay = st.slider("Vertical Radius", 1, img_h, key="sel_ay")
+            selection = {"type": selection_type, "shape": (sel_cx, sel_cy, sel_ax, sel_ay)}
+        elif selection_type == "Uploaded Mask":
+            mask_file = st.file_uploader("Mask (white = apply)", type=["jpg", "jpeg", "png", "webp"])
+            # A newly uploaded mask becomes the selection; undo/redo may
+            # switch back to an earlier one of this session
+            if mask_file and mask_file.file_id not in masks:
+                mask = load_mask(np.array(Image.open(mask_file)), image.shape)
+                mask.setflags(write=False)
+                masks[mask_file.file_id] = mask
+                st.session_state["sel_mask_id"] = mask_file.file_id
+            mask_id = st.session_state["sel_mask_id"]
+            if mask_id in masks:
+                if mask_file is None or mask_file.file_id != mask_id:
+                    st.caption("Using an earlier mask from the edit history")
+                selection = {"type": selection_type, "mask_id": mask_id}
+        if selection_type != "Whole Image":
+            feather = st.slider("Feather", 0, 50, key="feather")
+            if selection is not None:
+                selection["feather"] = feather
+    region_mask = selection_mask(selection, image.shape, masks)
+
+    # Display the original and processed images side by side; only the
+    # processed side reruns when its parameters change
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Original Image")
+        st.image(image, width=None)
+    with col2:
+        effect_panel(image, uploaded_file.file_id, effect_option, suggestions, selection, region_mask)
+
+    # Contact sheet: every effect at a few settings, at thumbnail size
+    if st.sidebar.checkbox("🗂 Show Contact Sheet"):
+        st.subheader("Contact Sheet")
+        # Each row varies one parameter of the editor's current settings
+        sheet_base = {effect: editor_params(effect) for effect in all_effects}
+        img_h, img_w = image.shape[:2]
+        sheet_base["Spotlight"]["radius"] = min(sheet_base["Spotlight"]["radius"], min(img_h, img_w) // 2)
+        with st.spinner("Rendering contact sheet..."):
+            try:
+                sheet, sheet_cells = get_contact_sheet(uploaded_file.file_id, image, tuple(all_effects),
+                                                       sheet_base, st.session_state["seed"])
+            except CancelledError:
+                # Superseded by a newer render from this session
+                st.stop()
+        st.image(sheet, width=None)
+
+        # One button per cell, laid out like the sheet, loads its settings
+        st.caption("Load a cell's settings into the editor:")
+        for effect in all_effects:
+            row = [cell for cell in sheet_cells if cell["effect"] == effect]
+            for col, cell in zip(st.columns(len(row)), row):
+                with col:
+                    st.button(f"{effect}: {cell['value']:g}", key=f"sheet_{effect}_{cell['value']}",
+                              on_click=load_params, args=(effect, cell["params"]),
+                              use_container_width=True)
+
+    # Recent edits around the current one; previews are rendered on a
+    # thumbnail the first time they are shown, queued like any other render
+    history = st.session_state["history"]
+    if len(history.entries) > 1:
+        scheduler = get_scheduler()
+        session_id = get_session_id()
+        region = lambda selection, shape: selection_mask(selection, image.shape, masks, shape)
+        run = lambda render: scheduler.run(session_id, render, supersede=False)
+        with st.expander("🕘 Edit History"):
+            window = history.window(6)
+            for col, (index, entry) in zip(st.columns(len(window)), window):
+                with col:
+                    try:
+                        thumbnail = history_thumbnail(image, uploaded_file.file_id, entry, region, run)
+                    except CancelledError:
+                        # Superseded by a newer render from this session
+                        st.stop()
+                    st.image(thumbnail, width=None)
+                    label = f"{index + 1}. {entry['effect']}"
+                    if index == history.position:
+                        st.caption(f"▶ {label} (current)")
+                    else:
+                        st.button(label, key=f"history_{index}", on_click=go_to_history, args=(index,),
+                                  use_container_width=True)
+
     # Add a section for effect description
     with st.expander("ℹ️ About this effect"):
         if effect_option == "Spotlight":
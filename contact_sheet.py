@@ -0,0 +1,105 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from effects.registry import default_params, is_seeded, prepare_effect, render_effect, scale_params
+from effects.suggestions import make_thumbnail
+
+# Longest side of each cell, in pixels
+SHEET_CELL_SIZE = 192
+
+# The parameter each effect's row sweeps, and its values (spread over the
+# editor's slider range)
+SHEET_VALUES = {
+    "Spotlight": ("brightness", [1.0, 1.5, 2.0, 2.5]),
+    "Vignette": ("intensity", [0.75, 1.5, 2.25, 3.0]),
+    "Light Rays": ("intensity", [0.5, 1.0, 1.5, 2.0]),
+    "Light Leaks": ("intensity", [0.25, 0.5, 0.75, 1.0]),
+    "Flare": ("intensity", [0.25, 0.5, 0.75, 1.0]),
+    "Color Temperature": ("warmth", [-0.6, -0.2, 0.2, 0.6]),
+    "Dramatic Shadows": ("shadow_intensity", [0.75, 1.5, 2.25, 3.0]),
+    "Glowing Highlights": ("glow_intensity", [0.75, 1.5, 2.25, 3.0]),
+}
+
+LABEL_HEIGHT = 22
+PADDING = 4
+BACKGROUND = (30, 30, 30)
+
+
+def _to_rgb(cell):
+    """Expand grayscale renders so every cell is a 3-channel image."""
+    if cell.ndim == 2:
+        return cv2.cvtColor(cell, cv2.COLOR_GRAY2RGB)
+    return cell
+
+
+def render_contact_sheet(image, names=None, base_params=None, seed=0,
+                         cell_size=SHEET_CELL_SIZE, workers=None):
+    """
+    Render every effect at several values of one parameter into a single grid image.
+
+    The image is downscaled once, each effect's parameter-independent
+    intermediates are computed once on that thumbnail, and all cells are
+    rendered in parallel from them. Rows are effects, columns the values in
+    SHEET_VALUES.
+
+    Args:
+        image: The source image (RGB, as used by app.py).
+        names: Effect display names, one row each (default: SHEET_VALUES order).
+        base_params: Dict of effect name -> parameters held fixed across the
+            row, in full-resolution pixels (e.g. a spotlight center).
+        seed: Seed for randomized effects, so loading a cell reproduces its layout.
+        cell_size: Longest side of each cell in pixels.
+        workers: Number of render threads (default: CPU count).
+
+    Returns:
+        (sheet, cells): the grid image, and per cell a dict with "effect",
+        "param", "value", the full-resolution "params" to reproduce it, and
+        its "box" (x0, y0, x1, y1) in the sheet.
+    """
+    names = list(names or SHEET_VALUES)
+    base_params = base_params or {}
+    workers = workers or os.cpu_count() or 1
+
+    thumb = make_thumbnail(image, cell_size)
+    scale = thumb.shape[1] / image.shape[1]
+    thumb_h, thumb_w = thumb.shape[:2]
+
+    cells = []
+    for row, name in enumerate(names):
+        param, values = SHEET_VALUES[name]
+        params = {**default_params(name, image.shape), **base_params.get(name, {})}
+        if is_seeded(name):
+            params.setdefault("seed", seed)
+        for col, value in enumerate(values):
+            x0 = PADDING + col * (thumb_w + PADDING)
+            y0 = PADDING + row * (thumb_h + LABEL_HEIGHT + PADDING)
+            cells.append({
+                "effect": name,
+                "param": param,
+                "value": value,
+                "params": {**params, param: value},
+                "box": (x0, y0, x0 + thumb_w, y0 + thumb_h + LABEL_HEIGHT),
+            })
+
+    def render_cell(cell):
+        name = cell["effect"]
+        return _to_rgb(render_effect(name, prepared[name], **scale_params(name, cell["params"], scale)))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Analysis once per effect, shared by the whole row
+        prepared = dict(zip(names, pool.map(lambda name: prepare_effect(name, thumb), names)))
+        renders = list(pool.map(render_cell, cells))
+
+    columns = max(len(SHEET_VALUES[name][1]) for name in names)
+    sheet = np.full((PADDING + len(names) * (thumb_h + LABEL_HEIGHT + PADDING),
+                     PADDING + columns * (thumb_w + PADDING), 3), BACKGROUND, dtype=np.uint8)
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    for cell, render in zip(cells, renders):
+        x0, y0, x1, _ = cell["box"]
+        sheet[y0:y0 + thumb_h, x0:x1] = render[:, :, :3]
+        label = f"{cell['effect']}: {cell['value']:g}"
+        cv2.putText(sheet, label, (x0 + 2, y0 + thumb_h + 15), font, 0.4, (255, 255, 255), 1, cv2.LINE_AA)
+    return sheet, cells
@@ -0,0 +1,326 @@
+import argparse
+import contextlib
+import os
+import threading
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from edit_history import RENDER_CACHE_BYTES
+from effects import masks
+from effects.light_leaks import LEAK_OVERLAY_CACHE_BYTES
+from effects.light_rays import RAY_MASK_CACHE_BYTES
+from effects.registry import (EFFECTS, PREPARED_CACHE_BYTES, apply_effect, default_params, prepare_effect,
+                              render_effect, scale_params)
+from effects.roi import apply_effect_in_region, region_boxes
+from render_scheduler import check_cancelled
+
+MB = 1024 * 1024
+
+# Peak memory one render may use before it is downgraded, and the total for
+# the process's renders and caches across all sessions.
+RENDER_BUDGET_BYTES = int(os.environ.get("LIGHTING_RENDER_BUDGET_MB", 1024)) * MB
+TOTAL_BUDGET_BYTES = int(os.environ.get("LIGHTING_TOTAL_BUDGET_MB", 3328)) * MB
+
+# Process-wide caches fill up to their budgets and stay resident, so they are
+# deducted from the total; concurrently admitted renders share the rest (at
+# least one render's budget, so a render can always run).
+CACHE_BYTES = (PREPARED_CACHE_BYTES + masks.OVERSIZED_CACHE_BYTES + RAY_MASK_CACHE_BYTES
+               + LEAK_OVERLAY_CACHE_BYTES + RENDER_CACHE_BYTES)
+RENDER_CAPACITY_BYTES = max(TOTAL_BUDGET_BYTES - CACHE_BYTES, RENDER_BUDGET_BYTES)
+
+# Proxies are never rendered below this fraction of the original size
+MIN_PROXY_SCALE = 0.1
+
+# Per-effect linear cost in the number of image samples (height * width * channels):
+# bytes = bytes_per_sample * samples + base_bytes, likewise for seconds.
+# Measured offline with `python cost_model.py --calibrate` on a 4-core
+# development machine. The server never calibrates itself: tracing would count
+# other sessions' concurrent renders and flush their shared mask caches.
+DEFAULT_COSTS = {
+    "Spotlight": {"bytes_per_sample": 17.5, "base_bytes": 3.7e4, "seconds_per_sample": 1.1e-8, "base_seconds": 1.2e-3},
+    "Vignette": {"bytes_per_sample": 9.0, "base_bytes": 7.5e3, "seconds_per_sample": 3.3e-9, "base_seconds": 0.0},
+    "Light Rays": {"bytes_per_sample": 14.3, "base_bytes": 1e3, "seconds_per_sample": 3.2e-8, "base_seconds": 0.0},
+    "Light Leaks": {"bytes_per_sample": 2.0, "base_bytes": 4e2, "seconds_per_sample": 4.8e-8, "base_seconds": 1.4e-2},
+    "Flare": {"bytes_per_sample": 25.3, "base_bytes": 3.44e7, "seconds_per_sample": 2.6e-8, "base_seconds": 3.6e-2},
+    "Color Temperature": {"bytes_per_sample": 9.0, "base_bytes": 6e2, "seconds_per_sample": 4.4e-9, "base_seconds": 3e-4},
+    "Dramatic Shadows": {"bytes_per_sample": 2.0, "base_bytes": 2e2, "seconds_per_sample": 1.9e-9, "base_seconds": 0.0},
+    "Glowing Highlights": {"bytes_per_sample": 2.0, "base_bytes": 2e2, "seconds_per_sample": 2.3e-9, "base_seconds": 2e-4},
+}
+
+# Estimated bytes are padded by this factor: traced peaks vary slightly
+# between runs, and OpenCV's internal scratch buffers aren't traced at all
+MEMORY_HEADROOM = 1.1
+
+# The slope is fitted at sizes past the regime where fixed-size buffers (the
+# flare template) dominate; the base is then raised to cover a render at
+# FLOOR_SHAPE, so small images are not underestimated either.
+CALIBRATION_SHAPES = [(960, 1280, 3), (1440, 1920, 3), (2160, 2880, 3)]
+FLOOR_SHAPE = (240, 320, 3)
+
+# A typical phone photo (12 MP), used by self_check
+CHECK_SHAPE = (3000, 4000, 3)
+
+
+def _measure(name, image):
+    """
+    Peak traced bytes and wall time of one render with cold mask caches.
+
+    Tracing counts every thread's allocations and the mask caches are
+    process-wide, so only run this in a process that serves nothing else.
+    """
+    masks.clear_mask_caches()
+    params = default_params(name, image.shape)
+
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        apply_effect(name, image, **params)
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, seconds
+
+
+def calibrate(names=None, shapes=CALIBRATION_SHAPES, floor_shape=FLOOR_SHAPE):
+    """
+    Measure each effect at a few sizes and fit its linear cost model.
+
+    The base bytes are at least what a render at floor_shape needs beyond
+    the fitted slope, so fixed-size buffers are covered at every size.
+    NumPy and OpenCV result arrays are traced; OpenCV's internal scratch
+    buffers are not, so the fitted bytes are a slight underestimate.
+
+    Returns a dict shaped like DEFAULT_COSTS.
+    """
+    rng = np.random.default_rng(0)
+    costs = {}
+    for name in names or EFFECTS:
+        # Warm up once so one-off loads (e.g. the flare template) aren't fitted
+        warmup = rng.integers(0, 256, shapes[0], dtype=np.uint8)
+        apply_effect(name, warmup, **default_params(name, warmup.shape))
+
+        samples, peaks, times = [], [], []
+        for shape in shapes:
+            image = rng.integers(0, 256, shape, dtype=np.uint8)
+            peak, seconds = _measure(name, image)
+            samples.append(image.size)
+            peaks.append(peak)
+            times.append(seconds)
+
+        design = np.vstack([samples, np.ones(len(samples))]).T
+        bytes_per_sample, base_bytes = np.linalg.lstsq(design, peaks, rcond=None)[0]
+        seconds_per_sample, base_seconds = np.linalg.lstsq(design, times, rcond=None)[0]
+
+        floor = rng.integers(0, 256, floor_shape, dtype=np.uint8)
+        floor_peak, _ = _measure(name, floor)
+        base_bytes = max(base_bytes, floor_peak - max(0.0, bytes_per_sample) * floor.size)
+        costs[name] = {
+            "bytes_per_sample": max(0.0, float(bytes_per_sample)),
+            "base_bytes": max(0.0, float(base_bytes)),
+            "seconds_per_sample": max(0.0, float(seconds_per_sample)),
+            "base_seconds": max(0.0, float(base_seconds)),
+        }
+    return costs
+
+
+def estimate_cost(name, shape, costs=None):
+    """Estimated peak bytes and seconds of rendering an effect on an image of shape."""
+    cost = (costs or DEFAULT_COSTS)[name]
+    samples = int(np.prod(shape))
+    return {
+        "bytes": (cost["bytes_per_sample"] * samples + cost["base_bytes"]) * MEMORY_HEADROOM,
+        "seconds": cost["seconds_per_sample"] * samples + cost["base_seconds"],
+    }
+
+
+def plan_render(name, shape, budget_bytes=RENDER_BUDGET_BYTES, costs=None):
+    """
+    Decide how to render an effect within a memory budget.
+
+    Returns a dict with the estimate ("bytes", "seconds") and a "mode":
+    - "full": render at full resolution.
+    - "tiled": per-pixel effects render in bands of "tile_rows" rows.
+    - "proxy": render at "scale" of the original size and upscale the result.
+    """
+    estimate = estimate_cost(name, shape, costs)
+    plan = {"mode": "full", "scale": 1.0, "tile_rows": shape[0], **estimate}
+    if estimate["bytes"] <= budget_bytes:
+        return plan
+
+    cost = (costs or DEFAULT_COSTS)[name]
+    row_samples = int(np.prod(shape[1:]))
+    per_byte = cost["bytes_per_sample"] or 1.0
+    available = max(0.0, budget_bytes / MEMORY_HEADROOM - cost["base_bytes"])
+
+    if EFFECTS[name].get("tileable"):
+        plan["mode"] = "tiled"
+        plan["tile_rows"] = max(1, int(available / (per_byte * row_samples)))
+        return plan
+
+    plan["mode"] = "proxy"
+    plan["scale"] = float(np.clip(np.sqrt(available / (per_byte * np.prod(shape))), MIN_PROXY_SCALE, 1.0))
+    return plan
+
+
+def render_with_plan(name, image, params, plan, image_key=None):
+    """
+    Render an effect following a plan from plan_render.
+
+    Full-resolution renders reuse the cached prepared stage for image_key.
+    Between stages (and bands) a cancelled scheduler job stops early.
+    """
+    if plan["mode"] == "tiled":
+        output = None
+        for top in range(0, image.shape[0], plan["tile_rows"]):
+            check_cancelled()
+            band = apply_effect(name, image[top:top + plan["tile_rows"]], **params)
+            if output is None:
+                output = np.empty(image.shape[:1] + band.shape[1:], dtype=band.dtype)
+            output[top:top + band.shape[0]] = band
+        return output
+
+    if plan["mode"] == "proxy":
+        height, width = image.shape[:2]
+        scale = plan["scale"]
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        proxy = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        check_cancelled()
+        output = apply_effect(name, proxy, **scale_params(name, params, scale))
+        return cv2.resize(output, (width, height), interpolation=cv2.INTER_LINEAR)
+
+    prepared = prepare_effect(name, image, image_key)
+    check_cancelled()
+    return render_effect(name, prepared, **params)
+
+
+class MemoryGate:
+    """
+    Process-wide reservation of render memory.
+
+    Streamlit sessions share one process, so renders reserve their estimated
+    peak here and wait while the total would exceed capacity.
+    """
+
+    def __init__(self, capacity_bytes=RENDER_CAPACITY_BYTES):
+        self.capacity_bytes = capacity_bytes
+        self.reserved_bytes = 0
+        self._condition = threading.Condition()
+
+    @contextlib.contextmanager
+    def reserve(self, nbytes, timeout=None):
+        """Hold nbytes of the budget for the duration of the block.
+
+        Raises TimeoutError if the reservation can't be made within timeout seconds.
+        """
+        # A single render larger than the whole budget still runs, just alone
+        nbytes = min(int(nbytes), self.capacity_bytes)
+        with self._condition:
+            admitted = self._condition.wait_for(
+                lambda: self.reserved_bytes + nbytes <= self.capacity_bytes, timeout)
+            if not admitted:
+                raise TimeoutError("Timed out waiting for render memory")
+            self.reserved_bytes += nbytes
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.reserved_bytes -= nbytes
+                self._condition.notify_all()
+
+
+GATE = MemoryGate()
+
+
+def admit_render(name, image, params, costs=None, budget_bytes=RENDER_BUDGET_BYTES,
+                 gate=GATE, timeout=60, image_key=None, mask=None, feather=0):
+    """
+    Plan an effect render within budget, wait for memory, and render it.
+
+    With a mask the effect is applied only to the selected region (see
+    effects.roi), and the plan is made for the cropped area it computes on.
+
+    Returns (output, plan); plan["queued_seconds"] is how long the render
+    waited for memory held by other renders.
+    """
+    shape = image.shape
+    if mask is not None:
+        boxes = region_boxes(name, mask, feather)
+        if boxes is not None:
+            x0, y0, x1, y1 = boxes[1]
+            shape = (y1 - y0, x1 - x0) + image.shape[2:]
+
+    plan = plan_render(name, shape, budget_bytes, costs)
+    admitted_bytes = min(plan["bytes"], budget_bytes)
+
+    def render(crop, crop_params):
+        # Only full-frame crops can reuse the prepared stage cached for image_key
+        key = image_key if crop.shape == image.shape else None
+        return render_with_plan(name, crop, crop_params, plan, key)
+
+    start = time.perf_counter()
+    with gate.reserve(admitted_bytes, timeout):
+        plan["queued_seconds"] = time.perf_counter() - start
+        # The session may have moved on while this render waited for memory
+        check_cancelled()
+        if mask is None:
+            output = render(image, params)
+        else:
+            output = apply_effect_in_region(name, image, mask, params, feather, render)
+    return output, plan
+
+
+def describe_plan(plan):
+    """A user-facing note for renders that were downgraded or queued, else None."""
+    notes = []
+    if plan["mode"] == "proxy":
+        notes.append(f"Rendered at {plan['scale']:.0%} size and upscaled to stay within the "
+                     f"memory budget (full size would need ~{plan['bytes'] / MB:.0f} MB).")
+    elif plan["mode"] == "tiled":
+        notes.append(f"Rendered in bands of {plan['tile_rows']} rows to stay within the "
+                     f"memory budget (full size would need ~{plan['bytes'] / MB:.0f} MB).")
+    if plan.get("queued_seconds", 0) > 0.5:
+        notes.append(f"Waited {plan['queued_seconds']:.1f} s for other renders to finish.")
+    return " ".join(notes) or None
+
+
+def self_check(names=None, shape=CHECK_SHAPE, costs=None):
+    """
+    Check that the cost model covers each effect's measured peak at a realistic size.
+
+    Raises AssertionError if an estimate is below the traced peak, i.e. the
+    memory gate would reserve less than the render uses.
+    """
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, shape, dtype=np.uint8)
+    for name in names or EFFECTS:
+        peak, _ = _measure(name, image)
+        estimate = estimate_cost(name, shape, costs)["bytes"]
+        print(f"{name}: estimated {estimate / MB:.0f} MB, measured {peak / MB:.0f} MB")
+        assert estimate >= peak, f"{name}: estimate {estimate / MB:.0f} MB below measured peak {peak / MB:.0f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the per-effect render cost model.")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="measure every effect and print a table to replace DEFAULT_COSTS")
+    parser.add_argument("--check", action="store_true",
+                        help="check the estimates against measured peaks on a 12 MP image and exit")
+    args = parser.parse_args()
+
+    if args.calibrate:
+        print("DEFAULT_COSTS = {")
+        for name, cost in calibrate().items():
+            fields = ", ".join(f'"{key}": {value:.3g}' for key, value in cost.items())
+            print(f'    "{name}": {{{fields}}},')
+        print("}")
+    if args.check:
+        self_check()
+        print("Cost model check passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import collections
+import threading
+
+from effects.registry import apply_effect, scale_params
+from effects.roi import apply_effect_in_region
+from effects.suggestions import make_thumbnail
+
+# Rendered outputs are kept for recently viewed settings, up to this many bytes
+# in total across all sessions, so stepping back to them needs no render.
+RENDER_CACHE_BYTES = 256 * 1024 * 1024
+
+# Edits remembered per session; each is only an effect name and its parameters
+MAX_HISTORY = 100
+
+HISTORY_THUMBNAIL_SIZE = 128
+
+_render_cache = collections.OrderedDict()
+_render_cache_lock = threading.Lock()
+
+
+def _nbytes(value):
+    """Memory held by a cached value (an array or a tuple containing arrays)."""
+    if isinstance(value, tuple):
+        return sum(_nbytes(item) for item in value)
+    return getattr(value, "nbytes", 0)
+
+
+def is_cached(key):
+    """Whether a render is in the cache."""
+    with _render_cache_lock:
+        return key in _render_cache
+
+
+def cached_render(key, render):
+    """
+    Return the cached result for key, or call render() and cache it.
+
+    key must identify everything the result depends on (source, effect,
+    parameters, selection). Results are shared between sessions, so arrays
+    in them are made read-only.
+    """
+    with _render_cache_lock:
+        if key in _render_cache:
+            _render_cache.move_to_end(key)
+            return _render_cache[key]
+
+    result = render()
+    for item in result if isinstance(result, tuple) else (result,):
+        if hasattr(item, "setflags"):
+            item.setflags(write=False)
+
+    with _render_cache_lock:
+        _render_cache[key] = result
+        _render_cache.move_to_end(key)
+        total = sum(_nbytes(value) for value in _render_cache.values())
+        while total > RENDER_CACHE_BYTES and len(_render_cache) > 1:
+            _, evicted = _render_cache.popitem(last=False)
+            total -= _nbytes(evicted)
+    return result
+
+
+class EditHistory:
+    """
+    Undo/redo history of edits to one source image.
+
+    Each entry is only {"effect": name, "params": parameters, "selection":
+    selection} (the seed of randomized effects is one of the parameters; the
+    selection describes the area the effect was applied to, None for the whole
+    image); the image itself is referenced by source_key, e.g. the upload's
+    file id. Outputs are re-rendered on demand, see cached_render and
+    history_thumbnail.
+    """
+
+    def __init__(self, source_key, max_entries=MAX_HISTORY):
+        self.source_key = source_key
+        self.max_entries = max_entries
+        self.entries = []
+        self.position = -1
+
+    @property
+    def current(self):
+        """The entry being viewed, or None if nothing was recorded."""
+        return self.entries[self.position] if self.entries else None
+
+    def can_undo(self):
+        return self.position > 0
+
+    def can_redo(self):
+        return self.position < len(self.entries) - 1
+
+    def record(self, effect, params, selection=None):
+        """
+        Add an edit after the current entry, dropping any redo entries.
+
+        Returns False (and records nothing) if it matches the current entry,
+        e.g. when the editor re-renders an entry reached by undo.
+        """
+        entry = {"effect": effect, "params": dict(params), "selection": selection}
+        if entry == self.current:
+            return False
+        del self.entries[self.position + 1:]
+        self.entries.append(entry)
+        if len(self.entries) > self.max_entries:
+            del self.entries[0]
+        self.position = len(self.entries) - 1
+        return True
+
+    def go_to(self, index):
+        """Make entry index the current one and return it."""
+        if not 0 <= index < len(self.entries):
+            raise IndexError(f"History has no entry {index}")
+        self.position = index
+        return self.current
+
+    def undo(self):
+        """Step back one entry and return it (None if at the start)."""
+        return self.go_to(self.position - 1) if self.can_undo() else None
+
+    def redo(self):
+        """Step forward one entry and return it (None if at the end)."""
+        return self.go_to(self.position + 1) if self.can_redo() else None
+
+    def window(self, size):
+        """Up to size (index, entry) pairs around the current entry, oldest first."""
+        start = max(0, min(self.position - size // 2, len(self.entries) - size))
+        return list(enumerate(self.entries))[start:start + size]
+
+
+def history_thumbnail(image, source_key, entry, region=None, run=None, max_side=HISTORY_THUMBNAIL_SIZE):
+    """
+    Small preview of a history entry, rendered on a thumbnail of the source.
+
+    Previews are only made when first shown and are cached like full renders,
+    so they cost a thumbnail render once per entry.
+
+    region(selection, shape) returns the mask of an entry's selection at the
+    thumbnail's shape (None for the whole image); without it selections are
+    ignored. run(render) runs the render, e.g. on a scheduler; it defaults to
+    calling it directly.
+    """
+    name = entry["effect"]
+    selection = entry.get("selection")
+    key = ("thumbnail", source_key, max_side, name, repr(entry["params"]), repr(selection))
+
+    def render():
+        thumb = make_thumbnail(image, max_side)
+        scale = thumb.shape[1] / image.shape[1]
+        params = scale_params(name, entry["params"], scale)
+        image_key = (source_key, "thumbnail", max_side)
+        mask = region(selection, thumb.shape) if region is not None and selection is not None else None
+        if mask is None:
+            return apply_effect(name, thumb, image_key=image_key, **params)
+
+        def render_crop(crop, crop_params):
+            # Only full-frame crops can reuse the prepared stage cached for the thumbnail
+            crop_key = image_key if crop.shape == thumb.shape else None
+            return apply_effect(name, crop, image_key=crop_key, **crop_params)
+
+        return apply_effect_in_region(name, thumb, mask, params, selection["feather"] * scale, render_crop)
+
+    return cached_render(key, render if run is None else lambda: run(render))
@@ -1,26 +1,30 @@
-import cv2
 import numpy as np
 
 def apply_color_temperature(image, warmth=0):
     """Adjusts the color temperature of an image.
        warmth > 0 → Warmer (adds red/yellow)
        warmth < 0 → Cooler (adds blue)"""
-    
-    # Split into BGR channels
-    b, g, r = cv2.split(image.astype(np.float32))
+    return render_color_temperature(prepare_color_temperature(image), warmth)
+
+def prepare_color_temperature(image):
+    """Parameter-independent part of the effect: the float32 image."""
+    return image.astype(np.float32)
+
+def render_color_temperature(image_float, warmth=0):
+    """Adjust the color temperature of an image prepared by prepare_color_temperature."""
+    # Per-channel offsets in BGR order
+    offsets = np.zeros(image_float.shape[2], dtype=np.float32)
 
     if warmth > 0:  # Warm effect (increase red, decrease blue slightly)
-        r += warmth * 50
-        b -= warmth * 25
+        offsets[2] = warmth * 50
+        offsets[0] = -warmth * 25
     elif warmth < 0:  # Cool effect (increase blue, decrease red slightly)
-        b += abs(warmth) * 50
-        r -= abs(warmth) * 25
+        offsets[0] = abs(warmth) * 50
+        offsets[2] = -abs(warmth) * 25
 
-    # Clip values to valid range
-    b = np.clip(b, 0, 255)
-    g = np.clip(g, 0, 255)
-    r = np.clip(r, 0, 255)
+    # Shift channels and clip values to valid range
+    adjusted_image = image_float + offsets
+    np.clip(adjusted_image, 0, 255, out=adjusted_image)
 
-    # Merge back and convert to 8-bit
-    adjusted_image = cv2.merge([b, g, r]).astype(np.uint8)
-    return adjusted_image
+    # Convert to 8-bit
+    return adjusted_image.astype(np.uint8)
@@ -3,7 +3,10 @@ import numpy as np
 
 def apply_dramatic_shadows(image, shadow_intensity=1.5):
     """Enhances shadows for a dramatic effect."""
-    
+    return render_dramatic_shadows(prepare_dramatic_shadows(image), shadow_intensity)
+
+def prepare_dramatic_shadows(image):
+    """Parameter-independent part of the effect: the image and its shadow mask."""
     # Convert to grayscale
     gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
     
@@ -14,6 +17,12 @@ def apply_dramatic_shadows(image, shadow_intensity=1.5):
     # Convert mask to 3 channels (same as original image)
     shadow_mask = cv2.cvtColor(shadow_mask, cv2.COLOR_GRAY2BGR)
     
+    return image, shadow_mask
+
+def render_dramatic_shadows(prepared, shadow_intensity=1.5):
+    """Darken the shadows found by prepare_dramatic_shadows."""
+    image, shadow_mask = prepared
+    
     # Darken shadows by blending with the original
     result = cv2.addWeighted(image, 1, shadow_mask, -shadow_intensity, 0)
     
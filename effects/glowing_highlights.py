@@ -3,19 +3,19 @@ import numpy as np
 
 def apply_glowing_highlights(image, glow_intensity=0.5):
     """Enhances bright areas in the image to create a glowing effect."""
-    
-    # Convert to grayscale
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    
-    # Threshold to detect bright areas
-    _, highlight_mask = cv2.threshold(gray, 200, 255, cv2.THRESH_BINARY)
-    
-    # Convert mask to 3 channels
-    highlight_mask = cv2.cvtColor(highlight_mask, cv2.COLOR_GRAY2BGR)
-    
-    # Blur the bright areas to create a glow effect
+    return render_glowing_highlights(prepare_glowing_highlights(image), glow_intensity)
+
+def prepare_glowing_highlights(image):
+    """Parameter-independent part of the effect: the image and its blurred copy."""
+    # Blur the image to create a glow effect
     blurred = cv2.GaussianBlur(image, (15, 15), 10)
     
+    return image, blurred
+
+def render_glowing_highlights(prepared, glow_intensity=0.5):
+    """Blend the glow from prepare_glowing_highlights onto the image."""
+    image, blurred = prepared
+    
     # Blend the glowing highlights with the original image
     result = cv2.addWeighted(image, 1, blurred, glow_intensity, 0)
     
@@ -1,7 +1,12 @@
+import functools
+
 import cv2
 import numpy as np
 
-def apply_lens_flare(image, position=None, intensity=0.5, flare_size=1.0):
+from effects.masks import gaussian_spot_mask
+
+def apply_lens_flare(image, position=None, intensity=0.5, flare_size=1.0, seed=None, num_secondary=5,
+                     render_scale=1.0):
     """
     Applies a realistic lens flare effect with multiple flare elements.
     
@@ -9,19 +14,35 @@ def apply_lens_flare(image, position=None, intensity=0.5, flare_size=1.0):
     - position: (x, y) coordinates for the main flare. If None, auto-positioned.
     - intensity: Strength of the flare effect (0.0 to 1.0)
     - flare_size: Size multiplier for the flare elements
+    - seed: Seed for the secondary flare layout; None uses the global NumPy random state
+    - num_secondary: Number of secondary flare elements
+    - render_scale: Size of the image relative to the original, when rendering
+      a downscaled copy; shrinks the fixed-size flare template to match
     """
-    height, width = image.shape[:2]
-    
-    # If no position is given, set it in the upper right quadrant
-    if position is None:
-        position = (int(width * 0.7), int(height * 0.3))
-    
-    # Create a copy of the image to work with
-    result = image.copy().astype(np.float32) / 255.0
+    return render_lens_flare(prepare_lens_flare(image), position, intensity, flare_size, seed, num_secondary,
+                             render_scale)
+
+def prepare_lens_flare(image):
+    """
+    Parameter-independent part of the lens flare effect.
     
-    # Load a flare image with transparency
+    Returns the image as float32 in [0, 1] and the flare template.
+    """
+    height, width = image.shape[:2]
+    return image.astype(np.float32) / 255.0, load_flare_template(width, height)
+
+@functools.lru_cache(maxsize=1)
+def _read_flare_png():
+    """Read effects/flare.png once; None if it is missing."""
+    flare = cv2.imread("effects/flare.png", cv2.IMREAD_UNCHANGED)
+    if flare is not None:
+        flare.setflags(write=False)
+    return flare
+
+def load_flare_template(width, height):
+    """Load the flare image with transparency, or a synthetic one sized for the image."""
     try:
-        flare = cv2.imread("effects/flare.png", cv2.IMREAD_UNCHANGED)
+        flare = _read_flare_png()
         if flare is None:
             raise FileNotFoundError
     except:
@@ -39,11 +60,31 @@ def apply_lens_flare(image, position=None, intensity=0.5, flare_size=1.0):
                 alpha = max(0, 255 * (1 - distance / radius))
                 flare[y, x] = [255, 255, 255, alpha]
     
+    return flare
+
+def render_lens_flare(prepared, position=None, intensity=0.5, flare_size=1.0, seed=None, num_secondary=5,
+                      render_scale=1.0):
+    """Render a lens flare onto an image prepared by prepare_lens_flare."""
+    rng = np.random if seed is None else np.random.RandomState(seed)
+    image_float, flare = prepared
+    height, width = image_float.shape[:2]
+    
+    # flare.png has a fixed pixel size, so downscaled renders shrink it to
+    # match; the synthetic fallback is already sized to the image
+    template_scale = render_scale if flare is _read_flare_png() else 1.0
+    
+    # If no position is given, set it in the upper right quadrant
+    if position is None:
+        position = (int(width * 0.7), int(height * 0.3))
+    
+    # Create a copy of the image to work with
+    result = image_float.copy()
+    
     # Calculate the center of the image (for positioning secondary flares)
     center_x, center_y = width // 2, height // 2
     
     # Main flare at the specified position
-    add_flare_element(result, flare, position, flare_size * 1.0, intensity)
+    add_flare_element(result, flare, position, flare_size * template_scale, intensity)
     
     # Create a line from the center to the flare position
     dx = position[0] - center_x
@@ -51,10 +92,10 @@ def apply_lens_flare(image, position=None, intensity=0.5, flare_size=1.0):
     
     # Add secondary flares along the line from center to main flare
     # These create the "anamorphic" lens flare look
-    for i in range(1, 6):
+    for i in range(num_secondary):
         # Position secondary flares along the line from center to main flare
         # and also on the opposite side of the center
-        pos_factor = np.random.uniform(-0.8, 1.5)  # Randomize positions
+        pos_factor = rng.uniform(-0.8, 1.5)  # Randomize positions
         sec_x = int(center_x + dx * pos_factor)
         sec_y = int(center_y + dy * pos_factor)
         
@@ -63,11 +104,11 @@ def apply_lens_flare(image, position=None, intensity=0.5, flare_size=1.0):
             continue
             
         # Randomize size and intensity for secondary flares
-        sec_size = flare_size * np.random.uniform(0.2, 0.6)
-        sec_intensity = intensity * np.random.uniform(0.3, 0.7)
+        sec_size = flare_size * rng.uniform(0.2, 0.6)
+        sec_intensity = intensity * rng.uniform(0.3, 0.7)
         
         # Add the secondary flare
-        add_flare_element(result, flare, (sec_x, sec_y), sec_size, sec_intensity)
+        add_flare_element(result, flare, (sec_x, sec_y), sec_size * template_scale, sec_intensity)
     
     # Add a horizontal streak (anamorphic lens effect)
     streak = create_anamorphic_streak(width, height, position, intensity * 0.7)
@@ -132,41 +173,35 @@ def add_flare_element(image, flare_template, position, size=1.0, intensity=1.0):
         roi[:, :, c] = roi[:, :, c] * (1 - alpha) + (1 - (1 - roi[:, :, c]) * (1 - flare_rgb[:, :, c])) * alpha
 
 def create_anamorphic_streak(width, height, position, intensity=0.5):
-    """Create a horizontal streak effect (anamorphic lens flare)."""
-    streak = np.zeros((height, width, 3), dtype=np.float32)
-    
-    # Create a horizontal line with Gaussian falloff in vertical direction
+    """Create a horizontal streak effect (anamorphic lens flare).
+
+    Returns a single-channel (height, width, 1) mask that broadcasts across
+    the image channels.
+    """
+    # Gaussian falloff in vertical direction around the light source
     y_center = position[1]
-    for y in range(height):
-        # Gaussian falloff in vertical direction
-        y_intensity = np.exp(-((y - y_center) ** 2) / (2 * (height * 0.01) ** 2)) * intensity
-        streak[y, :] = [y_intensity, y_intensity, y_intensity]
+    y = np.arange(height, dtype=np.float32)
+    y_intensity = np.exp(-((y - y_center) ** 2) / (2 * (height * 0.01) ** 2)) * intensity
     
     # Apply horizontal gradient to fade the streak
-    x_gradient = np.linspace(0, 1, width)
+    x_gradient = np.linspace(0, 1, width, dtype=np.float32)
     x_gradient = 1 - np.abs(2 * x_gradient - 1)  # Create a peak at the light source
-    x_gradient = x_gradient.reshape(1, width, 1)
     
-    streak = streak * x_gradient * 0.7  # Reduce intensity for subtlety
+    # Outer product of the two profiles, reduced for subtlety
+    streak = y_intensity[:, None] * x_gradient[None, :] * np.float32(0.7)
     
-    return streak
+    return streak.astype(np.float32)[:, :, np.newaxis]
 
 def create_halo(width, height, position, radius, intensity=0.5):
-    """Create a circular halo effect around the light source."""
-    halo = np.zeros((height, width, 3), dtype=np.float32)
-    
-    # Create a mask for the halo
-    y, x = np.ogrid[:height, :width]
-    dist_squared = (x - position[0])**2 + (y - position[1])**2
-    
-    # Create a radial gradient
-    mask = np.exp(-dist_squared / (2 * (radius/3)**2))
-    
-    # Apply the mask to create the halo
-    for c in range(3):
-        halo[:, :, c] = mask * intensity
+    """Create a circular halo effect around the light source.
+
+    Returns a single-channel (height, width, 1) mask that broadcasts across
+    the image channels.
+    """
+    # Cached radial gradient; only the window moves with the light source
+    mask = gaussian_spot_mask((height, width), position, radius / 3)
     
-    return halo
+    return (mask * np.float32(intensity))[:, :, np.newaxis]
 
 def screen_blend(base, overlay):
     """Apply screen blending mode: 1 - (1-a) * (1-b)"""
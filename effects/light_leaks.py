@@ -1,10 +1,36 @@
 import cv2
 import numpy as np
 
-def apply_light_leaks(image, intensity=0.5):
-    """Applies a light leaks effect by overlaying a gradient with random bright patches."""
+from effects.masks import ByteBoundedCache
+
+# Seeded leak overlays are kept up to this many bytes in total
+LEAK_OVERLAY_CACHE_BYTES = 128 * 1024 * 1024
+
+_leak_overlay_cache = ByteBoundedCache(LEAK_OVERLAY_CACHE_BYTES)
+
+def apply_light_leaks(image, intensity=0.5, seed=None):
+    """Applies a light leaks effect by overlaying a gradient with random bright patches.
+       seed → seed for the leak layout; None uses the global NumPy random state"""
     height, width = image.shape[:2]
 
+    # Seeded overlays only depend on the image size, so they are cached
+    if seed is None:
+        overlay = create_leak_overlay(height, width, np.random)
+    else:
+        overlay = _cached_leak_overlay(height, width, seed)
+
+    # Blend the overlay with the original image
+    result = cv2.addWeighted(image, 1.0, overlay, intensity, 0)
+
+    return result
+
+def _cached_leak_overlay(height, width, seed):
+    """Seeded leak overlay, shared by every image of the same size."""
+    return _leak_overlay_cache.get((height, width, seed),
+                                   lambda: create_leak_overlay(height, width, np.random.RandomState(seed)))
+
+def create_leak_overlay(height, width, rng):
+    """Create the blurred overlay of random colored light leaks."""
     # Create a blank overlay
     overlay = np.zeros((height, width, 3), dtype=np.uint8)
 
@@ -18,17 +44,14 @@ def apply_light_leaks(image, intensity=0.5):
 
     # Randomly place light leaks
     for _ in range(4):  
-        x = np.random.randint(0, width // 2)
-        y = np.random.randint(0, height)
-        radius = np.random.randint(width // 6, width // 3)
-        color = colors[np.random.randint(0, len(colors))]
+        x = rng.randint(0, width // 2)
+        y = rng.randint(0, height)
+        radius = rng.randint(width // 6, width // 3)
+        color = colors[rng.randint(0, len(colors))]
 
         cv2.circle(overlay, (x, y), radius, color, -1)  # Draw the leak
 
     # Blur the overlay to make leaks soft
     overlay = cv2.GaussianBlur(overlay, (151, 151), 0)
 
-    # Blend the overlay with the original image
-    result = cv2.addWeighted(image, 1.0, overlay, intensity, 0)
-
-    return result
+    return overlay
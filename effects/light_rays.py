@@ -1,7 +1,14 @@
 import cv2
 import numpy as np
 
-def apply_light_rays_effect(image, intensity=0.5, angle=45, num_rays=20, ray_width=2, ray_length=0.8):
+from effects.masks import ByteBoundedCache
+
+# Seeded ray masks are kept up to this many bytes in total
+RAY_MASK_CACHE_BYTES = 128 * 1024 * 1024
+
+_ray_mask_cache = ByteBoundedCache(RAY_MASK_CACHE_BYTES)
+
+def apply_light_rays_effect(image, intensity=0.5, angle=45, num_rays=20, ray_width=2, ray_length=0.8, seed=None):
     """
     Applies a light rays (God Rays) effect with customizable parameters.
     
@@ -11,8 +18,52 @@ def apply_light_rays_effect(image, intensity=0.5, angle=45, num_rays=20, ray_wid
     - num_rays: Number of light rays to generate
     - ray_width: Width/thickness of each ray
     - ray_length: Length of rays as a proportion of image diagonal (0.0 to 1.0)
+    - seed: Seed for the ray jitter; None uses the global NumPy random state
+    """
+    prepared = prepare_light_rays(image)
+    return render_light_rays(prepared, intensity, angle, num_rays, ray_width, ray_length, seed)
+
+def prepare_light_rays(image):
+    """
+    Parameter-independent part of the light rays effect.
+    
+    Returns the inverted float image (1 - image / 255) used by the screen
+    blend, so it can be reused across renders of the same image.
     """
-    height, width = image.shape[:2]
+    return 1.0 - image.astype(np.float32) / 255.0
+
+def render_light_rays(inverse, intensity=0.5, angle=45, num_rays=20, ray_width=2, ray_length=0.8, seed=None):
+    """Render light rays onto an image prepared by prepare_light_rays."""
+    height, width = inverse.shape[:2]
+    
+    # Seeded ray masks only depend on the image size and ray geometry, so they
+    # are cached and an intensity change costs a single blend
+    if seed is None:
+        light_rays = create_ray_mask(height, width, angle, num_rays, ray_width, ray_length, np.random)
+    else:
+        light_rays = _cached_ray_mask(height, width, angle, num_rays, ray_width, ray_length, seed)
+    
+    # Single channel that broadcasts across the image channels
+    light_rays = light_rays * np.float32(intensity)
+    if inverse.ndim == 3:
+        light_rays = light_rays[:, :, np.newaxis]
+    
+    # Screen blend mode: 1 - (1-a) * (1-b)
+    blended = 1.0 - inverse * (1.0 - light_rays)
+    blended = np.clip(blended, 0.0, 1.0)
+    
+    # Convert back to 8-bit image
+    result = (blended * 255).astype(np.uint8)
+    return result
+
+def _cached_ray_mask(height, width, angle, num_rays, ray_width, ray_length, seed):
+    """Seeded ray mask, shared by every image of the same size."""
+    key = (height, width, angle, num_rays, ray_width, ray_length, seed)
+    return _ray_mask_cache.get(key, lambda: create_ray_mask(
+        height, width, angle, num_rays, ray_width, ray_length, np.random.RandomState(seed)))
+
+def create_ray_mask(height, width, angle, num_rays, ray_width, ray_length, rng):
+    """Create the blurred single-channel light rays mask (0.0 to 1.0)."""
     diagonal = np.sqrt(height**2 + width**2)
     
     # Convert angle to radians
@@ -34,7 +85,7 @@ def apply_light_rays_effect(image, intensity=0.5, angle=45, num_rays=20, ray_wid
     # Generate multiple light rays
     for i in range(num_rays):
         # Randomize ray angle slightly for natural look
-        ray_angle = angle_rad + np.radians(np.random.uniform(-15, 15))
+        ray_angle = angle_rad + np.radians(rng.uniform(-15, 15))
         
         # Calculate ray end point
         ray_length_px = diagonal * ray_length
@@ -43,7 +94,7 @@ def apply_light_rays_effect(image, intensity=0.5, angle=45, num_rays=20, ray_wid
         
         # Draw the ray
         cv2.line(light_rays, (source_x, source_y), (end_x, end_y), 
-                 np.random.uniform(0.7, 1.0), thickness=ray_width)
+                 rng.uniform(0.7, 1.0), thickness=ray_width)
     
     # Apply Gaussian blur to soften the rays
     light_rays = cv2.GaussianBlur(light_rays, (0, 0), diagonal * 0.01)
@@ -52,17 +103,4 @@ def apply_light_rays_effect(image, intensity=0.5, angle=45, num_rays=20, ray_wid
     glow = cv2.GaussianBlur(light_rays, (0, 0), diagonal * 0.03)
     light_rays = cv2.addWeighted(light_rays, 0.6, glow, 0.4, 0)
     
-    # Convert to 3-channel image
-    light_rays = cv2.merge([light_rays] * 3)
-    
-    # Apply screen blending mode for more realistic light
-    image_float = image.astype(np.float32) / 255.0
-    light_rays = light_rays * intensity
-    
-    # Screen blend mode: 1 - (1-a) * (1-b)
-    blended = 1.0 - (1.0 - image_float) * (1.0 - light_rays)
-    blended = np.clip(blended, 0.0, 1.0)
-    
-    # Convert back to 8-bit image
-    result = (blended * 255).astype(np.uint8)
-    return result
+    return light_rays
@@ -0,0 +1,181 @@
+import collections
+import functools
+import threading
+
+import cv2
+import numpy as np
+
+# Position-dependent masks are built once on a canvas that is twice the image
+# size and handed out as shifted windows, so moving a center is free. Those
+# canvases are large, so they are kept up to this many bytes in total; images
+# whose canvas alone would exceed it get their masks computed directly.
+OVERSIZED_CACHE_BYTES = 256 * 1024 * 1024
+
+
+class ByteBoundedCache:
+    """
+    Thread-safe LRU cache of read-only arrays, bounded by their total bytes.
+
+    When several threads ask for the same missing key, one builds it and the
+    others wait for the result. Values larger than the whole budget are
+    returned without being cached.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """Return the cached array for key, calling build() to make it if missing."""
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    return self._entries[key]
+                pending = self._building.get(key)
+                if pending is None:
+                    pending = self._building[key] = threading.Event()
+                    break
+            # Another thread is building it; check again once it is done
+            pending.wait()
+
+        try:
+            value = build()
+            value.setflags(write=False)
+            with self._lock:
+                if value.nbytes <= self.max_bytes:
+                    self._entries[key] = value
+                    total = sum(entry.nbytes for entry in self._entries.values())
+                    while total > self.max_bytes:
+                        _, evicted = self._entries.popitem(last=False)
+                        total -= evicted.nbytes
+        finally:
+            with self._lock:
+                del self._building[key]
+            pending.set()
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+@functools.lru_cache(maxsize=32)
+def gaussian_profile(length, sigma):
+    """
+    Return a 1D Gaussian falloff of the given length, peaking at 1.0.
+
+    The array is cached and read-only; multiply it into a copy rather than
+    modifying it in place.
+    """
+    profile = cv2.getGaussianKernel(length, sigma).ravel().astype(np.float32)
+    profile /= profile.max()
+    profile.setflags(write=False)
+    return profile
+
+
+def vignette_profiles(shape, intensity=1.5):
+    """
+    Return the (row, column) gains of a vignette for an image of the given shape.
+
+    The 2D vignette is the outer product of the two profiles, so callers can
+    apply it separably without forming the full mask.
+    """
+    height, width = shape[:2]
+    rows = gaussian_profile(height, height / intensity)
+    cols = gaussian_profile(width, width / intensity)
+    return rows, cols
+
+
+def expand_mask(mask, ndim):
+    """Add trailing axes to a 2D mask so it broadcasts across image channels."""
+    return mask.reshape(mask.shape + (1,) * (ndim - mask.ndim))
+
+
+def _spotlight_falloff(dist_squared, radius, ambient_light):
+    """Map squared distances to spotlight gains (full, linear falloff, ambient)."""
+    mask = np.ones(dist_squared.shape, dtype=np.float32)
+
+    # Falloff region sits between 0.7*radius and radius
+    inner_radius_squared = (0.7 * radius) ** 2
+    radius_squared = radius ** 2
+    falloff_region = (dist_squared > inner_radius_squared) & (dist_squared <= radius_squared)
+    if np.any(falloff_region):
+        normalized_dist = (np.sqrt(dist_squared[falloff_region]) - 0.7 * radius) / (0.3 * radius)
+        mask[falloff_region] = 1.0 - normalized_dist
+    mask[dist_squared > radius_squared] = ambient_light
+    return mask
+
+
+def _gaussian_falloff(dist_squared, sigma):
+    """Map squared distances to a Gaussian falloff peaking at 1.0."""
+    return np.exp(-dist_squared / np.float32(2 * sigma ** 2)).astype(np.float32)
+
+
+_FALLOFFS = {
+    "spotlight": _spotlight_falloff,
+    "gaussian": _gaussian_falloff,
+}
+
+
+def _distance_squared(height, width, center):
+    """Squared distance from center for every pixel of a (height, width) grid."""
+    y = (np.arange(height, dtype=np.float32) - np.float32(center[1])) ** 2
+    x = (np.arange(width, dtype=np.float32) - np.float32(center[0])) ** 2
+    return y[:, None] + x[None, :]
+
+
+_oversized_cache = ByteBoundedCache(OVERSIZED_CACHE_BYTES)
+
+
+def _oversized_mask(kind, shape, params):
+    """
+    Build (or fetch from the cache) a (2h+1, 2w+1) mask centered on (w, h).
+
+    Any window of size (h, w) cut from it is the same mask centered somewhere
+    in [0, w] x [0, h] of the image.
+    """
+    height, width = shape
+
+    def build():
+        dist_squared = _distance_squared(2 * height + 1, 2 * width + 1, (width, height))
+        return _FALLOFFS[kind](dist_squared, *params)
+
+    return _oversized_cache.get((kind, shape, params), build)
+
+
+def clear_mask_caches():
+    """Drop every cached mask (used to measure cold-cache costs)."""
+    gaussian_profile.cache_clear()
+    _oversized_cache.clear()
+
+
+def radial_mask(kind, shape, center, *params):
+    """
+    Return a single-channel float32 mask of the given kind centered at center.
+
+    Centers inside the image (edges included) are served as views into a
+    cached oversized mask; centers further out, and images too large for the
+    oversized cache, are computed directly.
+    """
+    height, width = shape[:2]
+    cx, cy = int(round(center[0])), int(round(center[1]))
+
+    oversized_bytes = (2 * height + 1) * (2 * width + 1) * np.dtype(np.float32).itemsize
+    if not (0 <= cx <= width and 0 <= cy <= height) or oversized_bytes > OVERSIZED_CACHE_BYTES:
+        return _FALLOFFS[kind](_distance_squared(height, width, (cx, cy)), *params)
+
+    big = _oversized_mask(kind, (height, width), params)
+    return big[height - cy:2 * height - cy, width - cx:2 * width - cx]
+
+
+def spotlight_mask(shape, center, radius, ambient_light=0.2):
+    """Spotlight gain: 1.0 inside 0.7*radius, linear falloff to radius, ambient outside."""
+    return radial_mask("spotlight", shape, center, radius, ambient_light)
+
+
+def gaussian_spot_mask(shape, center, sigma):
+    """Circular Gaussian falloff around center, peaking at 1.0."""
+    return radial_mask("gaussian", shape, center, sigma)
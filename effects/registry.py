@@ -0,0 +1,181 @@
+import collections
+import threading
+
+from effects.spotlight import apply_spotlight_effect, prepare_spotlight, render_spotlight
+from effects.vignette import apply_vignette_effect, prepare_vignette, render_vignette
+from effects.light_rays import apply_light_rays_effect, prepare_light_rays, render_light_rays
+from effects.color_temperature import apply_color_temperature, prepare_color_temperature, render_color_temperature
+from effects.dramatic_shadows import apply_dramatic_shadows, prepare_dramatic_shadows, render_dramatic_shadows
+from effects.glowing_highlights import apply_glowing_highlights, prepare_glowing_highlights, render_glowing_highlights
+from effects.light_leaks import apply_light_leaks
+from effects.lens_flare import apply_lens_flare, prepare_lens_flare, render_lens_flare
+
+# Every effect by its display name. "apply" is the one-shot function; effects
+# with expensive parameter-independent work also split it into "prepare"
+# (image -> intermediates, reusable across renders) and "render"
+# (intermediates + parameters -> output). Parameters are passed by the keyword
+# names of the apply function. "seeded" effects take a seed keyword that fixes
+# their random layout. "pixel_params" are measured in pixels and must be scaled
+# when rendering at another resolution; "tileable" effects are purely per-pixel
+# and can be applied band by band. "roi_margin" is the context (in pixels) an
+# effect reads around each output pixel, for effects that can be rendered on a
+# crop; "offset_params" are positions that must be shifted into the crop.
+# "quality_params" map costly count parameters to the lowest value that still
+# looks acceptable, for previews that trade quality for speed. "scale_param"
+# receives the render scale itself, for effects with fixed-size artwork.
+EFFECTS = {
+    "Spotlight": {
+        "apply": apply_spotlight_effect,
+        "prepare": prepare_spotlight,
+        "render": render_spotlight,
+        "pixel_params": ("center", "radius"),
+        "roi_margin": 0,
+        "offset_params": ("center",),
+    },
+    "Vignette": {
+        "apply": apply_vignette_effect,
+        "prepare": prepare_vignette,
+        "render": render_vignette,
+    },
+    "Light Rays": {
+        "apply": apply_light_rays_effect,
+        "prepare": prepare_light_rays,
+        "render": render_light_rays,
+        "seeded": True,
+        "pixel_params": ("ray_width",),
+        "quality_params": {"num_rays": 5},
+    },
+    # The leak overlay doesn't depend on the image, so it is cached by seed
+    # inside the effect and there is nothing to prepare
+    "Light Leaks": {"apply": apply_light_leaks, "seeded": True},
+    "Flare": {
+        "apply": apply_lens_flare,
+        "prepare": prepare_lens_flare,
+        "render": render_lens_flare,
+        "seeded": True,
+        "pixel_params": ("position",),
+        "scale_param": "render_scale",
+        "quality_params": {"num_secondary": 0},
+    },
+    "Color Temperature": {
+        "apply": apply_color_temperature,
+        "prepare": prepare_color_temperature,
+        "render": render_color_temperature,
+        "tileable": True,
+        "roi_margin": 0,
+    },
+    "Dramatic Shadows": {
+        "apply": apply_dramatic_shadows,
+        "prepare": prepare_dramatic_shadows,
+        "render": render_dramatic_shadows,
+        # Half of the 21px adaptive threshold block
+        "roi_margin": 10,
+    },
+    "Glowing Highlights": {
+        "apply": apply_glowing_highlights,
+        "prepare": prepare_glowing_highlights,
+        "render": render_glowing_highlights,
+        # Half of the 15px blur kernel
+        "roi_margin": 7,
+    },
+}
+
+# Prepared intermediates are kept for recently used (image, effect) pairs, up
+# to this many bytes in total, so slider moves only pay for the render stage.
+PREPARED_CACHE_BYTES = 512 * 1024 * 1024
+
+_prepared_cache = collections.OrderedDict()
+_prepared_cache_lock = threading.Lock()
+
+
+def is_seeded(name):
+    """Whether an effect is randomized and accepts a seed keyword."""
+    return EFFECTS[name].get("seeded", False)
+
+
+def _nbytes(prepared):
+    """Memory held by a prepared value (an array or a tuple of arrays)."""
+    if isinstance(prepared, tuple):
+        return sum(_nbytes(item) for item in prepared)
+    return getattr(prepared, "nbytes", 0)
+
+
+def prepare_effect(name, image, image_key=None):
+    """
+    Compute the parameter-independent intermediates of an effect for image.
+
+    When image_key identifies the image (e.g. an upload's file id), the result
+    is cached under (image_key, name) and reused by later calls.
+    """
+    prepare = EFFECTS[name].get("prepare")
+    if prepare is None:
+        return image
+    if image_key is None:
+        return prepare(image)
+
+    key = (image_key, name)
+    with _prepared_cache_lock:
+        if key in _prepared_cache:
+            _prepared_cache.move_to_end(key)
+            return _prepared_cache[key]
+
+    prepared = prepare(image)
+
+    with _prepared_cache_lock:
+        _prepared_cache[key] = prepared
+        _prepared_cache.move_to_end(key)
+        total = sum(_nbytes(value) for value in _prepared_cache.values())
+        while total > PREPARED_CACHE_BYTES and len(_prepared_cache) > 1:
+            _, evicted = _prepared_cache.popitem(last=False)
+            total -= _nbytes(evicted)
+    return prepared
+
+
+def render_effect(name, prepared, **params):
+    """Render an effect from the output of prepare_effect."""
+    effect = EFFECTS[name]
+    render = effect.get("render", effect["apply"])
+    return render(prepared, **params)
+
+
+def apply_effect(name, image, image_key=None, **params):
+    """
+    Apply an effect by display name.
+
+    With an image_key the prepared intermediates are cached, so repeated
+    renders of the same image with new parameters only run the render stage.
+    """
+    if image_key is None:
+        return EFFECTS[name]["apply"](image, **params)
+    return render_effect(name, prepare_effect(name, image, image_key), **params)
+
+
+def default_params(name, shape):
+    """Parameters for an effect on an image of shape, for effects with required ones."""
+    height, width = shape[:2]
+    if name == "Spotlight":
+        return {"center": (width // 2, height // 2), "radius": min(height, width) // 3}
+    if name == "Flare":
+        return {"position": (width // 3, height // 3)}
+    return {}
+
+
+def scale_params(name, params, scale):
+    """
+    Scale an effect's pixel-valued parameters for rendering at another resolution.
+
+    Points and sizes are rounded to whole pixels; sizes never drop below 1.
+    """
+    scaled = dict(params)
+    for key in EFFECTS[name].get("pixel_params", ()):
+        value = scaled.get(key)
+        if value is None:
+            continue
+        if isinstance(value, (tuple, list)):
+            scaled[key] = tuple(int(round(v * scale)) for v in value)
+        else:
+            scaled[key] = max(1, int(round(value * scale)))
+    scale_param = EFFECTS[name].get("scale_param")
+    if scale_param is not None:
+        scaled[scale_param] = scaled.get(scale_param, 1.0) * scale
+    return scaled
@@ -0,0 +1,125 @@
+import cv2
+import numpy as np
+
+from effects.registry import EFFECTS, apply_effect
+
+
+def rectangle_mask(shape, x, y, width, height):
+    """Binary uint8 mask (255 inside) of an axis-aligned rectangle."""
+    mask = np.zeros(shape[:2], dtype=np.uint8)
+    cv2.rectangle(mask, (int(x), int(y)), (int(x + width) - 1, int(y + height) - 1), 255, -1)
+    return mask
+
+
+def ellipse_mask(shape, center, axes, angle=0):
+    """Binary uint8 mask (255 inside) of an ellipse with the given semi-axes."""
+    mask = np.zeros(shape[:2], dtype=np.uint8)
+    cv2.ellipse(mask, (int(center[0]), int(center[1])), (int(axes[0]), int(axes[1])),
+                angle, 0, 360, 255, -1)
+    return mask
+
+
+def load_mask(mask_image, shape):
+    """
+    Convert an uploaded mask image into a uint8 mask matching shape.
+
+    The alpha channel is used when present (RGBA or grayscale+alpha),
+    otherwise the brightness; white (or opaque) selects, black (or
+    transparent) leaves the image untouched. 1-bit masks (bool arrays) are
+    mapped to 0 and 255.
+    """
+    if mask_image.ndim == 3:
+        if mask_image.shape[2] in (2, 4):
+            mask_image = mask_image[:, :, -1]
+        elif mask_image.shape[2] == 1:
+            mask_image = mask_image[:, :, 0]
+        else:
+            mask_image = cv2.cvtColor(mask_image, cv2.COLOR_RGB2GRAY)
+    if mask_image.dtype == np.bool_:
+        mask_image = mask_image.astype(np.uint8) * 255
+    elif mask_image.dtype != np.uint8:
+        mask_image = np.clip(mask_image, 0, 255).astype(np.uint8)
+    height, width = shape[:2]
+    if mask_image.shape[:2] != (height, width):
+        mask_image = cv2.resize(mask_image, (width, height), interpolation=cv2.INTER_LINEAR)
+    return mask_image
+
+
+def _expand(box, pad, shape):
+    """Grow an (x0, y0, x1, y1) box by pad pixels, clipped to the image."""
+    x0, y0, x1, y1 = box
+    return (max(0, x0 - pad), max(0, y0 - pad),
+            min(shape[1], x1 + pad), min(shape[0], y1 + pad))
+
+
+def region_boxes(name, mask, feather=0):
+    """
+    Boxes needed to apply an effect under a mask, as (x0, y0, x1, y1).
+
+    Returns (blend_box, compute_box): the mask's bounding box grown by the
+    feather, and that box grown by the effect's "roi_margin" (the context
+    its filters read). Effects without a margin need the whole frame.
+    Returns None if the mask is empty.
+    """
+    x, y, w, h = cv2.boundingRect(mask if mask.dtype == np.uint8 else (mask > 0).astype(np.uint8))
+    if w == 0 or h == 0:
+        return None
+
+    blend_box = _expand((x, y, x + w, y + h), int(np.ceil(3 * feather)), mask.shape)
+
+    margin = EFFECTS[name].get("roi_margin")
+    if margin is None:
+        compute_box = (0, 0, mask.shape[1], mask.shape[0])
+    else:
+        compute_box = _expand(blend_box, margin, mask.shape)
+    return blend_box, compute_box
+
+
+def offset_params(name, params, dx, dy):
+    """Shift an effect's position parameters into a crop starting at (dx, dy)."""
+    shifted = dict(params)
+    for key in EFFECTS[name].get("offset_params", ()):
+        if shifted.get(key) is not None:
+            x, y = shifted[key]
+            shifted[key] = (x - dx, y - dy)
+    return shifted
+
+
+def apply_effect_in_region(name, image, mask, params, feather=0, render=None):
+    """
+    Apply an effect only where mask is set, feather-blending it back.
+
+    Only the mask's bounding box plus the effect's margin is processed, so the
+    cost scales with the selected area. mask is a (height, width) array, uint8
+    (0-255) or float (0.0-1.0); feather is the Gaussian sigma, in pixels, used
+    to soften its edge.
+
+    render(crop, params) renders the crop; it defaults to apply_effect.
+    """
+    boxes = region_boxes(name, mask, feather)
+    if boxes is None:
+        return image.copy()
+    (bx0, by0, bx1, by1), (cx0, cy0, cx1, cy1) = boxes
+
+    if render is None:
+        render = lambda crop, crop_params: apply_effect(name, crop, **crop_params)
+
+    # Render the compute box, then keep the part under the blend box
+    crop = image[cy0:cy1, cx0:cx1]
+    rendered = render(crop, offset_params(name, params, cx0, cy0))
+    rendered = rendered[by0 - cy0:by1 - cy0, bx0 - cx0:bx1 - cx0]
+
+    # Feathered alpha for the blend box only
+    alpha = mask[by0:by1, bx0:bx1].astype(np.float32)
+    if mask.dtype == np.uint8:
+        alpha /= 255.0
+    if feather > 0:
+        alpha = cv2.GaussianBlur(alpha, (0, 0), feather)
+    if image.ndim == 3:
+        alpha = alpha[:, :, np.newaxis]
+
+    result = image.copy()
+    original = image[by0:by1, bx0:bx1].astype(np.float32)
+    blended = original + (rendered.astype(np.float32) - original) * alpha
+    result[by0:by1, bx0:bx1] = np.clip(blended, 0, 255).astype(image.dtype)
+    return result
@@ -0,0 +1,154 @@
+import functools
+import os
+
+import cv2
+import numpy as np
+
+# Analysis runs on a thumbnail no larger than this on its longest side, so the
+# cost stays in the milliseconds whatever the upload size.
+THUMBNAIL_SIZE = 256
+
+
+def make_thumbnail(image, max_side=THUMBNAIL_SIZE):
+    """
+    Downscale an image so its longest side is at most max_side pixels.
+
+    The image is decimated by striding first, so the cost depends on the
+    thumbnail size rather than the upload size. Alpha channels are dropped.
+    """
+    if image.ndim == 3 and image.shape[2] == 4:
+        image = image[:, :, :3]
+
+    height, width = image.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1.0:
+        return image.copy()
+
+    # Stride down to roughly twice the target size, then area-average the rest
+    step = max(1, int(1 / (2 * scale)))
+    small = np.ascontiguousarray(image[::step, ::step])
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return cv2.resize(small, size, interpolation=cv2.INTER_AREA)
+
+
+def _to_gray(thumb):
+    """Grayscale copy of a thumbnail (2D images are returned unchanged)."""
+    if thumb.ndim == 2:
+        return thumb
+    return cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+
+
+def _to_full(point, thumb_shape, full_shape):
+    """Map an (x, y) point on the thumbnail back to full-resolution pixels."""
+    sx = full_shape[1] / thumb_shape[1]
+    sy = full_shape[0] / thumb_shape[0]
+    x = min(full_shape[1] - 1, int((point[0] + 0.5) * sx))
+    y = min(full_shape[0] - 1, int((point[1] + 0.5) * sy))
+    return x, y
+
+
+def find_bright_peak(thumb):
+    """Return the (x, y) thumbnail position of the brightest smoothed region."""
+    gray = _to_gray(thumb)
+    sigma = max(1.0, max(gray.shape) * 0.02)
+    blurred = cv2.GaussianBlur(gray, (0, 0), sigma)
+    _, _, _, max_loc = cv2.minMaxLoc(blurred)
+    return max_loc
+
+
+@functools.lru_cache(maxsize=1)
+def _face_cascade():
+    """Load the frontal face Haar cascade shipped with opencv-python, if any."""
+    data = getattr(cv2, "data", None)
+    if data is None or not hasattr(cv2, "CascadeClassifier"):
+        return None
+    path = os.path.join(data.haarcascades, "haarcascade_frontalface_default.xml")
+    cascade = cv2.CascadeClassifier(path)
+    if cascade.empty():
+        return None
+    return cascade
+
+
+def find_faces(thumb):
+    """Detect faces on a thumbnail; returns (x, y, w, h) boxes, largest first."""
+    cascade = _face_cascade()
+    if cascade is None:
+        return []
+    gray = cv2.equalizeHist(_to_gray(thumb))
+    faces = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(16, 16))
+    return sorted((tuple(int(v) for v in f) for f in faces), key=lambda f: f[2] * f[3], reverse=True)
+
+
+def find_salient_point(thumb):
+    """
+    Return the (x, y) thumbnail position of the most salient region.
+
+    Saliency is approximated by local contrast: the smoothed difference
+    between the image and a heavily blurred copy of itself.
+    """
+    gray = _to_gray(thumb).astype(np.float32)
+    background = cv2.GaussianBlur(gray, (0, 0), max(gray.shape) * 0.1)
+    contrast = cv2.GaussianBlur(np.abs(gray - background), (0, 0), max(gray.shape) * 0.05)
+    _, _, _, max_loc = cv2.minMaxLoc(contrast)
+    return max_loc
+
+
+def suggest_flare_position(thumb, full_shape):
+    """Place the flare on the brightest region of the image."""
+    return _to_full(find_bright_peak(thumb), thumb.shape, full_shape)
+
+
+def suggest_light_rays_angle(thumb):
+    """
+    Angle (0-360) that makes light rays come from the brightest region.
+
+    apply_light_rays_effect puts its source at center - (cos, sin) * distance,
+    so the angle is the direction from the bright peak towards the center.
+    """
+    height, width = thumb.shape[:2]
+    bx, by = find_bright_peak(thumb)
+    dx, dy = width / 2 - bx, height / 2 - by
+    if dx == 0 and dy == 0:
+        return 45
+    return int(round(np.degrees(np.arctan2(dy, dx)))) % 360
+
+
+def suggest_spotlight_center(thumb, full_shape):
+    """Center the spotlight on the largest face, or the most salient region."""
+    faces = find_faces(thumb)
+    if faces:
+        x, y, w, h = faces[0]
+        point = (x + w / 2, y + h / 2)
+    else:
+        point = find_salient_point(thumb)
+    return _to_full(point, thumb.shape, full_shape)
+
+
+def suggest_warmth(thumb):
+    """
+    Warmth (-1.0 to 1.0) that neutralizes a color cast under the gray-world assumption.
+
+    apply_color_temperature moves the third channel by 50 * warmth and the
+    first by -25 * warmth, so their mean difference closes at 75 per unit.
+    """
+    if thumb.ndim != 3:
+        return 0.0
+    means = thumb.reshape(-1, thumb.shape[2]).mean(axis=0)
+    warmth = -(means[2] - means[0]) / 75.0
+    return float(np.clip(warmth, -1.0, 1.0))
+
+
+def suggest_parameters(image, max_side=THUMBNAIL_SIZE):
+    """
+    Propose starting parameters for each effect from a thumbnail of image.
+
+    Returns a dict with flare_position, light_rays_angle, spotlight_center
+    (all in full-resolution pixels or degrees) and warmth (-1.0 to 1.0).
+    """
+    thumb = make_thumbnail(image, max_side)
+    return {
+        "flare_position": suggest_flare_position(thumb, image.shape),
+        "light_rays_angle": suggest_light_rays_angle(thumb),
+        "spotlight_center": suggest_spotlight_center(thumb, image.shape),
+        "warmth": suggest_warmth(thumb),
+    }
@@ -1,28 +1,26 @@
-import cv2
 import numpy as np
 
+from effects.masks import expand_mask, vignette_profiles
+
 def apply_vignette_effect(image, intensity=1.5):
     """Applies a vignette effect by darkening the edges while keeping the center bright."""
-    height, width = image.shape[:2]
-
-    # Create Gaussian kernel for X and Y
-    X = cv2.getGaussianKernel(width, width / intensity)
-    Y = cv2.getGaussianKernel(height, height / intensity)
-    
-    # Outer product to create 2D mask
-    mask = Y @ X.T
+    return render_vignette(prepare_vignette(image), intensity)
 
-    # Normalize to range [0,1]
-    mask = mask / np.max(mask)
+def prepare_vignette(image):
+    """Parameter-independent part of the vignette effect: the float32 image."""
+    return image.astype(np.float32)
 
-    # Convert mask to 3-channel for color images
-    mask = cv2.merge([mask, mask, mask])
+def render_vignette(image_float, intensity=1.5):
+    """Render a vignette onto an image prepared by prepare_vignette."""
+    # Cached Gaussian gains for rows and columns; their outer product is the
+    # vignette mask, so apply them separably instead of forming it
+    rows, cols = vignette_profiles(image_float.shape, intensity)
 
-    # Convert image to float and apply vignette
-    image = image.astype(np.float32) / 255.0
-    vignette_image = image * mask
+    # Apply row and column gains
+    vignette_image = image_float * expand_mask(rows[:, None], image_float.ndim)
+    vignette_image *= expand_mask(cols[None, :], image_float.ndim)
 
     # Convert back to 8-bit image
-    vignette_image = (vignette_image * 255).astype(np.uint8)
+    vignette_image = vignette_image.astype(np.uint8)
     
     return vignette_image
@@ -0,0 +1,149 @@
+import io
+import json
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import cv2
+
+# Renditions by name, largest first, with the maximum length of their longest
+# side in pixels (None keeps the full size). Images are never upscaled.
+RENDITIONS = {"full": None, "web": 2048, "thumb": 320}
+
+# Output formats: file extension, OpenCV encode flags, and whether alpha is kept
+FORMATS = {
+    "jpeg": {"ext": ".jpg", "flags": [cv2.IMWRITE_JPEG_QUALITY, 90], "alpha": False},
+    "webp": {"ext": ".webp", "flags": [cv2.IMWRITE_WEBP_QUALITY, 85], "alpha": True},
+    "png": {"ext": ".png", "flags": [cv2.IMWRITE_PNG_COMPRESSION, 6], "alpha": True},
+}
+
+
+def build_pyramid(image, renditions=RENDITIONS):
+    """
+    Downscale an image to every rendition size.
+
+    Each level is resized from the previous (larger) one with area
+    averaging, so the full-size image is only read once.
+
+    Returns a dict of rendition name -> image, in the order of renditions.
+    """
+    levels = {}
+    current = image
+    for name, max_side in sorted(renditions.items(), key=lambda item: -(item[1] or float("inf"))):
+        height, width = current.shape[:2]
+        if max_side is not None and max(height, width) > max_side:
+            scale = max_side / max(height, width)
+            size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+            current = cv2.resize(current, size, interpolation=cv2.INTER_AREA)
+        levels[name] = current
+    return {name: levels[name] for name in renditions}
+
+
+def _to_bgr(image, keep_alpha):
+    """Convert an RGB(A) or grayscale image to OpenCV channel order for encoding."""
+    if image.ndim == 2:
+        return image
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_RGBA2BGRA if keep_alpha else cv2.COLOR_RGBA2BGR)
+    return cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+
+
+def _encode(image, fmt):
+    """Encode one image; returns (bytes, seconds)."""
+    spec = FORMATS[fmt]
+    start = time.perf_counter()
+    ok, data = cv2.imencode(spec["ext"], _to_bgr(image, spec["alpha"]), spec["flags"])
+    if not ok:
+        raise RuntimeError(f"Could not encode {fmt}")
+    return data.tobytes(), time.perf_counter() - start
+
+
+def encode_bundle(image, renditions=RENDITIONS, formats=("jpeg", "webp", "png"), workers=None):
+    """
+    Encode every rendition of an image in every format, in parallel.
+
+    Args:
+        image: The processed image (RGB or RGBA, as used by app.py).
+        renditions: Dict of rendition name -> maximum longest side (see RENDITIONS).
+        formats: Names of formats in FORMATS.
+        workers: Number of encode threads (default: CPU count).
+
+    Returns:
+        (files, manifest): a dict of file name -> encoded bytes, and the
+        manifest describing each file's rendition, format, size, bytes and
+        encode time.
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    pyramid = build_pyramid(image, renditions)
+    jobs = [(name, fmt) for name in pyramid for fmt in formats]
+
+    # OpenCV releases the GIL while encoding, so the threads run in parallel
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda job: _encode(pyramid[job[0]], job[1]), jobs))
+
+    files = {}
+    entries = []
+    for (name, fmt), (data, seconds) in zip(jobs, results):
+        filename = name + FORMATS[fmt]["ext"]
+        height, width = pyramid[name].shape[:2]
+        files[filename] = data
+        entries.append({
+            "file": filename,
+            "rendition": name,
+            "format": fmt,
+            "width": width,
+            "height": height,
+            "bytes": len(data),
+            "encode_seconds": round(seconds, 4),
+        })
+
+    manifest = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "source": {"width": image.shape[1], "height": image.shape[0]},
+        "files": entries,
+        "total_bytes": sum(entry["bytes"] for entry in entries),
+        "total_seconds": round(time.perf_counter() - start, 4),
+    }
+    return files, manifest
+
+
+def bundle_zip(files, manifest):
+    """Pack encoded files and manifest.json into a zip archive, returned as bytes."""
+    buf = io.BytesIO()
+    # The images are already compressed, so they are stored as is
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_STORED) as archive:
+        for filename, data in files.items():
+            archive.writestr(filename, data)
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+    return buf.getvalue()
+
+
+def export_bundle(image, path, renditions=RENDITIONS, formats=("jpeg", "webp", "png"), workers=None):
+    """
+    Write every rendition and format of an image to one zip bundle.
+
+    The bundle is written to a temporary file next to path and moved into
+    place, so readers never see a partial bundle.
+
+    Returns the manifest (also stored in the bundle as manifest.json), with
+    the bundle's "path" and "bytes" added.
+    """
+    files, manifest = encode_bundle(image, renditions, formats, workers)
+    data = bundle_zip(files, manifest)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".bundle-", suffix=".zip.tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        # mkstemp creates the file private to the owner; bundles are ordinary results
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return {**manifest, "path": path, "bytes": len(data)}
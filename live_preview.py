@@ -0,0 +1,273 @@
+import argparse
+import inspect
+import time
+
+import cv2
+import numpy as np
+
+from effects.registry import EFFECTS, apply_effect, default_params, is_seeded, scale_params
+
+# Working resolution moves in steps of this size, so seeded layers cached by
+# image size (ray masks, leak overlays) are reused while the scale is steady
+SCALE_STEP = 0.05
+
+
+class SyntheticSource:
+    """
+    A cv2.VideoCapture stand-in that generates frames, for testing without a camera.
+
+    Frames are a moving color gradient with a bright disc, in BGR like a camera.
+    """
+
+    def __init__(self, width=640, height=480, num_frames=None):
+        self.width = width
+        self.height = height
+        self.num_frames = num_frames
+        self.index = 0
+
+        y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+        self._x = x / width
+        self._y = y / height
+
+    def isOpened(self):
+        return True
+
+    def grab(self):
+        if self.num_frames is not None and self.index >= self.num_frames:
+            return False
+        self.index += 1
+        return True
+
+    def retrieve(self):
+        t = self.index / 30.0
+        frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        frame[:, :, 0] = 255 * (0.5 + 0.5 * np.sin(2 * np.pi * (self._x + t)))
+        frame[:, :, 1] = 255 * self._y
+        frame[:, :, 2] = 255 * (0.5 + 0.5 * np.cos(2 * np.pi * (self._y - t)))
+        center = (int(self.width * (0.5 + 0.3 * np.cos(t))), int(self.height * (0.5 + 0.3 * np.sin(t))))
+        cv2.circle(frame, center, min(self.width, self.height) // 10, (255, 255, 255), -1)
+        return True, frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def release(self):
+        pass
+
+
+class QualityController:
+    """
+    Adapts working resolution and costly effect parameters to a target frame rate.
+
+    Per-frame cost is smoothed with an exponential moving average. When it is
+    over the frame budget, costly parameters are lowered first and then the
+    resolution; when there is headroom, resolution is restored first and then
+    the parameters. Effects without quality_params (or no effect name) only
+    adjust the resolution.
+
+    - scale: working resolution as a fraction of the source (min_scale to 1.0)
+    - quality: 0.0 (cheapest) to 1.0 (as requested) for the effect's quality_params
+    """
+
+    def __init__(self, target_fps=24, name=None, min_scale=0.25, smoothing=0.3, headroom=0.7,
+                 quality_step=0.25):
+        self.has_quality_params = name is not None and bool(EFFECTS[name].get("quality_params"))
+        self.budget = 1.0 / target_fps
+        self.min_scale = min_scale
+        self.smoothing = smoothing
+        self.headroom = headroom
+        self.quality_step = quality_step
+        self.scale = 1.0
+        self.quality = 1.0
+        self.frame_cost = None
+
+    def update(self, seconds):
+        """Record the cost of one frame and adjust scale and quality."""
+        if self.frame_cost is None:
+            self.frame_cost = seconds
+        else:
+            self.frame_cost += self.smoothing * (seconds - self.frame_cost)
+
+        if self.frame_cost > self.budget:
+            if self.has_quality_params and self.quality > 0:
+                self.quality = max(0.0, self.quality - self.quality_step)
+            else:
+                # Cost scales with the pixel count, i.e. with scale squared
+                target = self.scale * np.sqrt(self.budget / self.frame_cost)
+                self.scale = max(self.min_scale, self._snap(min(target, self.scale - SCALE_STEP)))
+            # Start measuring the new settings afresh
+            self.frame_cost = None
+        elif self.frame_cost < self.budget * self.headroom:
+            if self.scale < 1.0:
+                self.scale = min(1.0, self._snap(self.scale + SCALE_STEP))
+                self.frame_cost = None
+            elif self.has_quality_params and self.quality < 1.0:
+                self.quality = min(1.0, self.quality + self.quality_step)
+                self.frame_cost = None
+
+    def _snap(self, scale):
+        return round(scale / SCALE_STEP) * SCALE_STEP
+
+    def apply_quality(self, name, params):
+        """Lower the effect's costly parameters according to the current quality."""
+        adjusted = dict(params)
+        signature = inspect.signature(EFFECTS[name]["apply"])
+        for key, lowest in EFFECTS[name].get("quality_params", {}).items():
+            requested = adjusted.get(key, signature.parameters[key].default)
+            adjusted[key] = int(round(lowest + self.quality * (requested - lowest)))
+        return adjusted
+
+
+def render_live_frame(name, frame, params, controller):
+    """Render one frame at the controller's current resolution and quality."""
+    params = controller.apply_quality(name, params)
+    scale = controller.scale
+    if scale >= 1.0:
+        return apply_effect(name, frame, **params)
+
+    height, width = frame.shape[:2]
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    output = apply_effect(name, small, **scale_params(name, params, scale))
+    return cv2.resize(output, (width, height), interpolation=cv2.INTER_LINEAR)
+
+
+def run_live(source, name, params=None, target_fps=24, max_frames=None, on_frame=None,
+             controller=None, clock=time.perf_counter, sleep=time.sleep):
+    """
+    Run an effect on a live frame source at a target frame rate.
+
+    source is a cv2.VideoCapture or anything with the same read()/grab()
+    methods (e.g. SyntheticSource). Frames are due every 1 / target_fps
+    seconds; when a frame takes longer, the frames that fell due meanwhile
+    are grabbed and dropped so the preview stays current. on_frame(output,
+    stats) is called for each rendered frame and may return False to stop.
+
+    Returns the final stats: frames rendered, dropped frames, achieved fps,
+    mean frame cost in seconds, and the controller's scale and quality.
+    """
+    controller = controller or QualityController(target_fps, name)
+    interval = 1.0 / target_fps
+    params = dict(params or {})
+
+    ok, frame = source.read()
+    if not ok:
+        raise RuntimeError("Frame source returned no frames")
+    params = {**default_params(name, frame.shape), **params}
+    if is_seeded(name):
+        # Keep the random layout steady from frame to frame
+        params.setdefault("seed", 0)
+
+    stats = {"frames": 0, "dropped": 0, "fps": 0.0, "frame_cost": 0.0,
+             "scale": controller.scale, "quality": controller.quality}
+    total_cost = 0.0
+    start = clock()
+    next_due = start
+
+    while ok:
+        frame_start = clock()
+        output = render_live_frame(name, frame, params, controller)
+        cost = clock() - frame_start
+        controller.update(cost)
+
+        total_cost += cost
+        stats["frames"] += 1
+        elapsed = clock() - start
+        stats["fps"] = stats["frames"] / elapsed if elapsed > 0 else 0.0
+        stats["frame_cost"] = total_cost / stats["frames"]
+        stats["scale"] = controller.scale
+        stats["quality"] = controller.quality
+
+        if on_frame is not None and on_frame(output, stats) is False:
+            break
+        if max_frames is not None and stats["frames"] >= max_frames:
+            break
+
+        # Wait for the next frame's slot, or drop the frames we fell behind on
+        next_due += interval
+        now = clock()
+        if now < next_due:
+            sleep(next_due - now)
+        else:
+            missed = int((now - next_due) / interval)
+            for _ in range(missed):
+                if not source.grab():
+                    ok = False
+                    break
+                stats["dropped"] += 1
+            next_due += missed * interval
+        if ok:
+            ok, frame = source.read()
+
+    return stats
+
+
+def self_check(num_frames=20):
+    """
+    Check the frame-budget behaviour on synthetic frames, without a camera.
+
+    The target frame rate is set far above what any effect reaches, so every
+    frame is over budget whatever the machine: effects with quality_params
+    must lower them fully before the resolution, effects without must only
+    lower the resolution, and frames that fall due meanwhile must be dropped.
+    Raises AssertionError on failure.
+    """
+    for name in EFFECTS:
+        history = []
+        source = SyntheticSource(320, 240)
+        stats = run_live(source, name, target_fps=100000, max_frames=num_frames,
+                         on_frame=lambda output, stats: history.append((stats["scale"], stats["quality"])))
+
+        assert stats["frames"] == num_frames, name
+        assert stats["frames"] + stats["dropped"] == source.index, name
+        assert stats["dropped"] > 0, f"{name}: no frames dropped while over budget"
+        assert stats["scale"] < 1.0, f"{name}: resolution was not lowered"
+        if EFFECTS[name].get("quality_params"):
+            assert all(quality == 0.0 for scale, quality in history if scale < 1.0), \
+                f"{name}: resolution lowered before quality"
+        else:
+            assert all(quality == 1.0 for _, quality in history), \
+                f"{name}: quality lowered without quality_params"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live preview of a lighting effect on a camera or video.")
+    parser.add_argument("--source", default="0",
+                        help="camera index, video file/URL, or 'synthetic' (default: camera 0)")
+    parser.add_argument("--effect", default="Light Rays", choices=sorted(EFFECTS))
+    parser.add_argument("--fps", type=float, default=24, help="target frame rate")
+    parser.add_argument("--check", action="store_true",
+                        help="check the frame-budget controller on synthetic frames and exit")
+    args = parser.parse_args()
+
+    if args.check:
+        self_check()
+        print("Frame-budget controller check passed")
+        return
+
+    if args.source == "synthetic":
+        source = SyntheticSource()
+    else:
+        source = cv2.VideoCapture(int(args.source) if args.source.isdigit() else args.source)
+    if not source.isOpened():
+        raise SystemExit(f"Could not open video source {args.source}")
+
+    def show(output, stats):
+        text = (f"{stats['fps']:.1f} fps  dropped {stats['dropped']}  "
+                f"scale {stats['scale']:.2f}  quality {stats['quality']:.2f}")
+        cv2.putText(output, text, (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1, cv2.LINE_AA)
+        cv2.imshow("Lighting Effects Live", output)
+        return (cv2.waitKey(1) & 0xFF) != 27  # ESC key to exit
+
+    try:
+        stats = run_live(source, args.effect, target_fps=args.fps, on_frame=show)
+    finally:
+        source.release()
+        cv2.destroyAllWindows()
+    print(f"Rendered {stats['frames']} frames at {stats['fps']:.1f} fps, dropped {stats['dropped']}")
+
+
+if __name__ == "__main__":
+    main()
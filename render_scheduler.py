@@ -0,0 +1,185 @@
+import collections
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+
+import cv2
+
+# Renders that may run at once across all sessions. Each render gets an equal
+# share of the cores for OpenCV's own thread pool, so workers don't oversubscribe.
+RENDER_WORKERS = int(os.environ.get("LIGHTING_RENDER_WORKERS", max(1, (os.cpu_count() or 1) // 2)))
+
+
+_current = threading.local()
+
+
+class _Job:
+    def __init__(self, session_id, fn, args, kwargs):
+        self.session_id = session_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.submitted = time.perf_counter()
+        self.cancel_requested = threading.Event()
+
+
+def check_cancelled():
+    """
+    Raise CancelledError if the job running on this thread was cancelled.
+
+    Renders call this between stages so a superseded render stops early.
+    Outside a scheduler worker it does nothing.
+    """
+    job = getattr(_current, "job", None)
+    if job is not None and job.cancel_requested.is_set():
+        raise CancelledError()
+
+
+class RenderScheduler:
+    """
+    Central render queue shared by every Streamlit session.
+
+    A fixed pool of workers serves per-session FIFO queues round-robin, so a
+    session with many queued renders can't starve the others. Submitting a
+    new render for a session cancels its other renders, since their
+    parameters are already stale: queued ones are dropped and running ones
+    stop at their next check_cancelled().
+    """
+
+    def __init__(self, workers=RENDER_WORKERS, threads_per_worker=None):
+        self.workers = max(1, workers)
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.workers)
+        # OpenCV's thread pool is process-wide, so this is set once here
+        cv2.setNumThreads(self.threads_per_worker)
+
+        self._queues = {}
+        self._running = {}
+        self._ready = collections.deque()
+        self._stats = {}
+        self._condition = threading.Condition()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"render-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, session_id, fn, *args, supersede=True, **kwargs):
+        """
+        Queue fn(*args, **kwargs) for a session and return its Future.
+
+        With supersede, the session's other jobs are cancelled (see cancel);
+        their futures raise CancelledError.
+        """
+        job = _Job(session_id, fn, args, kwargs)
+        with self._condition:
+            if supersede:
+                for future in [queued.future for queued in self._queues.get(session_id, ())] + \
+                              [running.future for running in self._running.values()
+                               if running.session_id == session_id]:
+                    self._cancel_locked(future)
+            queue = self._queues.setdefault(session_id, collections.deque())
+            queue.append(job)
+            if session_id not in self._ready:
+                self._ready.append(session_id)
+            self._condition.notify()
+        return job.future
+
+    def run(self, session_id, fn, *args, timeout=None, **kwargs):
+        """Submit a job (superseding by default) and wait for its result."""
+        return self.submit(session_id, fn, *args, **kwargs).result(timeout)
+
+    def cancel(self, future):
+        """
+        Cancel a submitted job.
+
+        A queued job is dropped; a running job is asked to stop and its
+        future raises CancelledError once it reaches a check_cancelled().
+        """
+        with self._condition:
+            self._cancel_locked(future)
+
+    def _cancel_locked(self, future):
+        running = self._running.get(future)
+        if running is not None:
+            running.cancel_requested.set()
+        elif future.cancel():
+            # Still queued; the worker that pops it will skip it
+            for session_id, queue in self._queues.items():
+                for job in queue:
+                    if job.future is future:
+                        self._session_stats(session_id)["cancelled"] += 1
+                        queue.remove(job)
+                        return
+
+    def stats(self, session_id):
+        """Queue wait and service time of a session's renders, in seconds."""
+        with self._condition:
+            stats = dict(self._session_stats(session_id))
+            stats["pending"] = len(self._queues.get(session_id, ()))
+        completed = stats["completed"] or 1
+        stats["mean_queue_wait"] = stats["total_queue_wait"] / completed
+        stats["mean_service_time"] = stats["total_service_time"] / completed
+        return stats
+
+    def _session_stats(self, session_id):
+        if session_id not in self._stats:
+            self._stats[session_id] = {
+                "completed": 0, "cancelled": 0,
+                "last_queue_wait": 0.0, "last_service_time": 0.0,
+                "total_queue_wait": 0.0, "total_service_time": 0.0,
+            }
+        return self._stats[session_id]
+
+    def _next_job(self):
+        """Pop the next job round-robin across sessions (caller holds the lock)."""
+        while True:
+            while not self._ready:
+                self._condition.wait()
+            session_id = self._ready.popleft()
+            queue = self._queues.get(session_id)
+            if not queue:
+                self._queues.pop(session_id, None)
+                continue
+            job = queue.popleft()
+            if queue:
+                self._ready.append(session_id)
+            else:
+                del self._queues[session_id]
+            return session_id, job
+
+    def _work(self):
+        while True:
+            with self._condition:
+                session_id, job = self._next_job()
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+                self._running[job.future] = job
+
+            started = time.perf_counter()
+            cancelled = False
+            _current.job = job
+            try:
+                result = job.fn(*job.args, **job.kwargs)
+            except BaseException as exc:
+                cancelled = isinstance(exc, CancelledError)
+                job.future.set_exception(exc)
+            else:
+                job.future.set_result(result)
+            finally:
+                _current.job = None
+            finished = time.perf_counter()
+
+            with self._condition:
+                del self._running[job.future]
+                stats = self._session_stats(session_id)
+                if cancelled:
+                    stats["cancelled"] += 1
+                    continue
+                stats["completed"] += 1
+                stats["last_queue_wait"] = started - job.submitted
+                stats["last_service_time"] = finished - started
+                stats["total_queue_wait"] += stats["last_queue_wait"]
+                stats["total_service_time"] += stats["last_service_time"]
@@ -0,0 +1,170 @@
+import collections
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from PIL import GifImagePlugin, Image
+
+from effects.registry import is_seeded, prepare_effect, render_effect
+
+# Easing curves map normalized segment time [0, 1] to progress [0, 1]
+EASINGS = {
+    "linear": lambda t: t,
+    "ease_in": lambda t: t * t,
+    "ease_out": lambda t: 1 - (1 - t) * (1 - t),
+    "ease_in_out": lambda t: t * t * (3 - 2 * t),
+    "hold": lambda t: 0.0 if t < 1 else 1.0,
+}
+
+
+def track_value(keyframes, t, easing="linear"):
+    """
+    Evaluate a parameter track at time t (0.0 to 1.0).
+
+    keyframes is a list of (time, value) pairs sorted by time. Values may be
+    numbers or tuples (e.g. a spotlight center); tuples are interpolated per
+    component. If every keyframe value is an integer the result is rounded,
+    so integer sliders such as angle stay integers.
+    """
+    ease = EASINGS[easing]
+    times = [k[0] for k in keyframes]
+    values = [np.asarray(k[1], dtype=np.float64) for k in keyframes]
+
+    if t <= times[0]:
+        value = values[0]
+    elif t >= times[-1]:
+        value = values[-1]
+    else:
+        i = int(np.searchsorted(times, t, side="right")) - 1
+        span = times[i + 1] - times[i]
+        progress = ease((t - times[i]) / span) if span > 0 else 1.0
+        value = values[i] + (values[i + 1] - values[i]) * progress
+
+    integral = all(np.issubdtype(np.asarray(k[1]).dtype, np.integer) for k in keyframes)
+    if integral:
+        value = np.rint(value).astype(int)
+    return value.item() if value.ndim == 0 else tuple(value.tolist())
+
+
+def _to_rgb(frame):
+    """Drop alpha or expand grayscale so every frame is a 3-channel image."""
+    if frame.ndim == 2:
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2RGB)
+    if frame.shape[2] == 4:
+        return cv2.cvtColor(frame, cv2.COLOR_RGBA2RGB)
+    return frame
+
+
+def sweep_frames(image, effect, param, keyframes, num_frames, easing="linear",
+                 params=None, seed=0, workers=None):
+    """
+    Render the frames of a parameter sweep, in order.
+
+    The effect's parameter-independent intermediates are computed once and
+    shared by every frame. Frames are rendered in parallel, but at most
+    2 * workers are in flight, so memory stays bounded however many frames
+    are requested. Randomized effects use the same seed for every frame so
+    their layout does not flicker.
+    """
+    workers = workers or os.cpu_count() or 1
+    params = dict(params or {})
+    if is_seeded(effect):
+        params.setdefault("seed", seed)
+
+    prepared = prepare_effect(effect, image)
+
+    def render_frame(index):
+        t = index / (num_frames - 1) if num_frames > 1 else 0.0
+        frame_params = dict(params)
+        frame_params[param] = track_value(keyframes, t, easing)
+        return _to_rgb(render_effect(effect, prepared, **frame_params))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = collections.deque()
+        for index in range(num_frames):
+            pending.append(pool.submit(render_frame, index))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _write_mp4(frames, path, fps):
+    """Stream RGB frames into an MP4 file one at a time."""
+    writer = None
+    count = 0
+    try:
+        for frame in frames:
+            if writer is None:
+                height, width = frame.shape[:2]
+                writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+                if not writer.isOpened():
+                    raise RuntimeError(f"Could not open video writer for {path}")
+            writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+            count += 1
+    finally:
+        if writer is not None:
+            writer.release()
+    return count
+
+
+def _write_gif(frames, path, fps):
+    """
+    Stream RGB frames into a looping GIF one at a time.
+
+    Each frame is palettized and encoded as it arrives, with its own color
+    table, and written straight to the file, so memory stays bounded however
+    many frames there are.
+    """
+    duration = int(round(1000 / fps))
+    count = 0
+    with open(path, "wb") as fp:
+        for frame in frames:
+            im = Image.fromarray(frame).quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+            if count == 0:
+                header, _ = GifImagePlugin.getheader(im, info={"loop": 0, "duration": duration})
+                fp.write(b"".join(header))
+            data = GifImagePlugin.getdata(im, duration=duration, include_color_table=True)
+            fp.write(b"".join(data))
+            # getdata returns a list held by a throwaway class that lives until
+            # the next garbage collection; empty it so the frame is freed now
+            data.clear()
+            count += 1
+        fp.write(b";")  # trailer
+    if count == 0:
+        os.remove(path)
+    return count
+
+
+def export_sweep(image, effect, param, keyframes, num_frames, path, easing="linear",
+                 params=None, fps=24, seed=0, workers=None):
+    """
+    Export an animation that sweeps one effect parameter along a keyframed track.
+
+    Args:
+        image: The source image (RGB, as used by app.py).
+        effect: Effect display name, as in effects.registry.EFFECTS.
+        param: Keyword name of the swept parameter (e.g. "angle", "center").
+        keyframes: List of (time, value) pairs with time in [0, 1].
+        num_frames: Number of frames to render.
+        path: Output file; the format is chosen by extension (.mp4 or .gif).
+        easing: Name of an easing curve in EASINGS, applied between keyframes.
+        params: The effect's other parameters, held fixed for every frame.
+        fps: Frame rate of the output.
+        seed: Seed shared by all frames of randomized effects.
+        workers: Number of render threads (default: CPU count).
+
+    Returns:
+        A dict with the output path, frame count and elapsed seconds.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    writers = {".mp4": _write_mp4, ".gif": _write_gif}
+    if ext not in writers:
+        raise ValueError(f"Unsupported sweep format '{ext}', expected .mp4 or .gif")
+
+    start = time.perf_counter()
+    frames = sweep_frames(image, effect, param, keyframes, num_frames, easing, params, seed, workers)
+    count = writers[ext](frames, path, fps)
+    return {"path": path, "frames": count, "seconds": time.perf_counter() - start}